@@ -2,7 +2,26 @@ import streamlit as st
 import google.generativeai as genai
 import os
 import datetime
+import hmac
+import logging
+import time
+import uuid
 from st_copy_to_clipboard import st_copy_to_clipboard  # <--- Add this line!
+from history import ConversationHistory
+import modes
+from dispatcher import Dispatcher, ServiceDegraded, is_transient
+import pricing
+import response_cache
+import telemetry
+from streaming import StreamRenderer
+from transcript import FORMATS, Transcript
+
+# Rerun timing starts here, before anything else runs
+rerun_started = time.perf_counter()
+# Time spent answering a prompt (model queue, retries, streaming). It's left out
+# of the rerun time, which is meant to be the script's own overhead.
+answer_ms = 0.0
+logger = logging.getLogger("anybudget")
 
 # 1. Configure the Page
 st.set_page_config(page_title="Any Budget Ai", page_icon="💡", layout="wide")
@@ -36,40 +55,53 @@ if not api_key:
         st.info("Please add your GOOGLE_API_KEY to the secrets to continue.")
         st.stop()
 
-genai.configure(api_key=api_key)
+# Configure once per process (per key), not on every rerun
+@st.cache_resource
+def configure_gemini(api_key):
+    genai.configure(api_key=api_key)
+
+configure_gemini(api_key)
 
 # 3. Dynamic Date
 today = datetime.date.today()
 
-# ==========================================
-# PRICING DATA
-# ==========================================
-POSTCARD_PRICES = """
-HERE IS THE OFFICIAL POSTCARD PRICING SHEET (2026).
-USE THIS TABLE TO QUOTE PRICES. IF A QUANTITY OR SIZE IS N/A, SAY WE CANNOT PRINT IT.
-
-| Size | Sides | 25 | 50 | 75 | 100 | 250 | 500 | 1000 | 2500 | 5000 | 7500 | 10000 |
-| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |
-| 4" X 6" | 4/0 or 4/4 | $35 | $45 | $55 | $65 | $75 | $85 | $125 | $245 | $295 | $345 | $495 |
-| 2" X 6" | 4/0 | $35 | $45 | $55 | $65 | $75 | $85 | $125 | $145 | $175 | N/A | $200.72 |
-| 3.5" X 5" | 4/0 or 4/4 | N/A | N/A | N/A | N/A | N/A | N/A | $81.02 | $131.95 | $204.05 | N/A | $388.44 |
-| 4.25" X 11" | 4/0 or 4/4 | $55 | $65 | $75 | $95 | $145 | $175 | $195 | $295 | $495 | N/A | $975 |
-| 4.25" X 5.5" | 4/0 or 4/4 | $35 | $45 | $55 | $65 | $75 | $85 | $125 | $245 | $295 | N/A | $495 |
-| 4.25" X 6" | 4/0 or 4/4 | N/A | N/A | N/A | $65 | $75 | $85 | $125 | $245 | $295 | N/A | $495 |
-| 5" X 7" | 4/0 or 4/4 | $55 | $65 | $75 | $85 | $145 | $175 | $195 | $245 | $395 | $595 | $795 |
-| 6" X 11" | 4/0 or 4/4 | $45 | $65 | $85 | $105 | $175 | $195 | $295 | $495 | $695 | $1,095 | $1,395 |
-| 6" X 9" | 4/0 or 4/4 | $45 | $65 | $85 | $105 | $175 | $195 | $295 | $395 | $595 | $895 | $1,095 |
-| 3.667" X 8.5"| 4/0 | $55 | $65 | $75 | $85 | $125 | $145 | $178.75| $287.32| $441.67| N/A | $876.26 |
-| 5.5" X 8.5" | 4/0 or 4/4 | $55 | $65 | $75 | $85 | $145 | $195 | $245 | $345 | $495 | $795 | $995 |
-| 5" X 8" | 4/0 or 4/4 | N/A | N/A | N/A | $85 | $145 | $195 | $245 | $345 | $495 | N/A | $595 |
-| 6" X 8.5" | 4/0 or 4/4 | $55 | $65 | $75 | $85 | $145 | $195 | $295 | $395 | $495 | N/A | $975 |
-| 6" X 8" | 4/0 or 4/4 | N/A | N/A | N/A | $105 | $175 | $195 | $245 | $345 | $513.72 | $810.34 | $1019.44 |
-
-Definition of Sides:
-- 4/0 means Full Color Front, Blank Back.
-- 4/4 means Full Color Front, Full Color Back.
-"""
+# Models are cached per (mode, day, knowledge chunks) for the whole process;
+# a new day means a new key, so the date in the prompt stays current
+@st.cache_resource(max_entries=64)
+def get_model(mode_name, day, chunk_tags=None):
+    return genai.GenerativeModel(
+        model_name=modes.MODEL_NAME,
+        system_instruction=modes.system_instruction(mode_name, day, chunk_tags),
+    )
+
+# Per-turn and per-rerun metrics, shared by every session (see the admin view below)
+@st.cache_resource
+def get_telemetry():
+    return telemetry.Telemetry(
+        jsonl_path=os.environ.get("TELEMETRY_PATH"),  # e.g. ".cache/telemetry.jsonl"
+        prometheus_path=os.environ.get("TELEMETRY_PROMETHEUS_PATH"),  # e.g. ".cache/anybudget.prom"
+    )
+
+metrics = get_telemetry()
+
+# Every Gemini call from every session queues here: caps concurrent requests,
+# retries 429s/timeouts with backoff, and stops calling while the API is down
+@st.cache_resource
+def get_dispatcher():
+    return Dispatcher(
+        max_in_flight=int(os.environ.get("MODEL_MAX_IN_FLIGHT", 4)),
+        max_retries=int(os.environ.get("MODEL_MAX_RETRIES", 3)),
+    )
+
+dispatcher = get_dispatcher()
 
+# Shown when Gemini is overloaded or down and we have nothing local to offer
+BUSY_MESSAGE = (
+    "Sorry, our assistant is getting a lot of questions right now. Please try again in a minute, "
+    "or reach us at (858) 278-3151 or orders@anybudget.com."
+)
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:8]
 
 # --- SIDEBAR NAVIGATION ---
 with st.sidebar:
@@ -80,7 +112,7 @@ with st.sidebar:
     # Kept the fix for the red text warning
     mode = st.radio(
         "Select Tool",
-        ["Print Expert (Chat)", "Marketing Copywriter ✍️", "Print School 🎓", "Idea Generator 💡"],
+        modes.MODE_NAMES,
         index=0,
         label_visibility="collapsed"
     )
@@ -90,6 +122,9 @@ with st.sidebar:
 
 # --- APP LOGIC ---
 
+# How many messages the chat shows before "Load earlier messages"
+HISTORY_WINDOW = 20
+
 # Reset history if mode changes
 if "current_mode" not in st.session_state:
     st.session_state.current_mode = mode
@@ -97,191 +132,193 @@ if "current_mode" not in st.session_state:
 if st.session_state.current_mode != mode:
     st.session_state.messages = []
     st.session_state.current_mode = mode
+    st.session_state.history_window = HISTORY_WINDOW
 
-# ==========================================
-# DEFINE MODES (Text Only - Super Stable)
-# ==========================================
-
-if mode == "Print Expert (Chat)":
-    page_title = "Any Budget Ai Assistant 💬"
-    system_instruction = f"""
-    You are the Any Budget AI Assistant. Today is {today}.
-
-    base_instruction =
-You are the AI Assistant for Any Budget Printing.
-Your tone is helpful, professional, and concise.
-
-IMPORTANT PRICING RULE:
-- When you quote a price from the table, YOU MUST always add "plus tax" after the dollar amount.
-- Example: "The price is $85 plus tax."
-    
-    YOUR RULES:
-    - Acceptable formats: PDF, PNG, TIF, or JPG.
-    - Bleeds: 0.0625 inches required on all sides.
-    - Resolution: 300 DPI minimum.
-    - Ever time you display a price show a dollar sign, $, in front of the price and include the cents even if zero $.00
-    - YOU MUST always add "plus tax" after the dollar amount.
-- Example: "The price is $85 plus tax."
-    - {POSTCARD_PRICES} 
-    - All Postcards are printed on heavy 14PT C2S Postcard stock. Quantities of 2,500 or more open up coating options, UV Coating on Front Only, UV Coating on Both Sides and Matte for the same price.
-    - Full Color Flyers and Brochures start as low as $35.00 plus tax, minimum order is 25
-    - Full Color Standard Business Cards come in 8 different sizes, 2x3.5, 2.125x3.375, 2.5x2.5,2x2,2x3,1.5x3.5,1.75x3.5. Turnaround time = 4 to 5 business days. UV Coating is available. 16pt C2S 100 = $55.00, 250 = $65.00, 500 = $75.00, 1,000 = $95.00, 2,500 = $125.00, 5,000 = $195.00, 10,000 = $225.00. Many other sizes available.
-    - All postcards, flyers and brochures orders of 1000 or less are printed same day/next day turnaround depending on what time of day you place your order. Quantities of 2,500 or more is 4-5 business days turnaround.
-    - Full Color Same-Day 3.5" X 2" Business Cards. 14pt C2S. 25 = $35.00, 50 = $37.50, 75 = $40.00, 100 = $45.00, 250 = $55.00, 500 = $65.00, 1,000 = $95.00
-    - Full Coolor 3.5x4 Foldover Business Cards are also available. Go to anybudget.com for prices.
-    - Full Color Suede Business Cards start as low as $69.33 plus tax, minimum order is 100
-    - Full Color Silk Business Cards start as low as $38.22 plus tax, minimum order is 25
-    - Postcard sizes available are 4x6, 5x7, 5.5x8.5, 6x11, 4.25x5.5 and more
-    - Flyers and brochures most common sizes are 8.5x11, 8.5x14 and 11x17 and more
-    - 8.5x11 Color Copies start at $.39 plus tax per side on white 28# color copy paper
-    - 8.5x11 Black Ink Xerox copies start at $.09 plus tax per side on white 20# copy paper
-    - We only provide Coil and Tape Binding and Saddle-Stitched Booklets
-    - Coil and Tape Binding per book prices are, plus tax 1-10 Books = $3.00, 11-25 Books = $2.50, 26-100 Books = $2.00, 101 or more = $1.50
-    - Clear Acetate front covers are $.40 per sheet plus tax and Black Vinyl cover are $.60 per sheet plus tax, 100# Gloss Covers are $.10 per sheet plus tax
-    - Staples are $.03 per staple for stapling upper-left corner or $.03 per staple 2 staples on the left side $.06 per book in this case
-    - Standard 3-hole and 2-hole punching is $.01 per sheet for either color or B&W copies
-    - All 8.5x11 Pastel 20# color paper, blue, green, goldenrod, pink, salmon, ivory, cream $.02 per sheet
-    - Astrobright 24/60# 8.5x11 is $.03 per sheet
-    - Astrobright 65# Cover stock is $.05 per sheet
-    - For any large format inquiry, calculate pricing internally but ONLY display the final price: 1. RIGID SIGNS (Foam Core/Coroplast): Multiply total square feet by 7.50 (Width" x Height" / 144). Minimum price is $25.00. 2. H-STAKES: For Coroplast signs, offer H-Stakes at $1.90 each. 3. BANNERS: Multiply total square feet by 3.75 (Width" x Height" / 144). Minimum price is $35.00. 4. OUTPUT: Respond with "The price for a [Size] [Product] is $[Price] plus tax. This includes standard finishing." If quoting Coroplast, add: "Would you like to add H-Stakes for $1.90 each?" 5. DO NOT show the mathematical formula in the chat.
-    For any large format inquiry, ALWAYS use this standard price list first. Do not use math if the size is listed here. 
-You are an AI assistant for Any Budget Printing & Mailing. Always use the following logic to quote prices for large format products. CRITICAL RULE: Never show your mathematical calculations, multipliers, or formulas to the user. You must perform all math silently and ONLY provide the final price.
-1. RIGID SIGNS (Foam Core & Coroplast - Single Sided):
-Always use this exact price list first based on Width" x Height": 12x12=$25, 12x18=$25, 18x24=$35, 24x24=$38, 20x30=$39, 22x28=$40, 18x36=$41, 23x30=$42, 24x31=$43, 18x48=$45, 24x36=$45, 23x40=$47.92, 28x36=$52.50, 27x40=$56.25, 24x48=$60, 29x44=$66.50, 32x40=$66.75, 36x46=$86.25, 36x48=$90, 48x48=$120, 40x60=$125, 48x96=$240.
-- For Double-Sided Rigid Signs: Multiply the single-sided price by 1.7. (DO NOT mention the 1.7 multiplier to the user. Just provide the final calculated total).
-- For Custom Sizes not on the list: Calculate (Width in inches x Height in inches / 144) x 7.50. Minimum price is $25.00.
-
-2. H-STAKES:
-If quoting a Coroplast yard sign, always ask: "Would you like to add H-Stakes for $1.90 each?"
-
-3. VINYL BANNERS (Direct Print, includes hems and grommets):
-Always use this exact price list first based on Width" x Height": 24x36=$35, 24x48=$35, 24x60=$37.50, 30x48=$37.50, 24x72=$45, 36x48=$45, 30x72=$56.25, 36x60=$56.25, 24x96=$60, 36x72=$67.50, 24x120=$75, 48x60=$75, 36x96=$90, 48x72=$90, 36x120=$112.50, 48x96=$120, 48x120=$150, 60x96=$150, 36x180=$168.75, 48x144=$180, 72x96=$180, 60x120=$187.50, 48x180=$225, 60x144=$225, 96x108=$270, 96x120=$300, 96x144=$360.
-- For Custom Sizes not on the list: Calculate (Width in inches x Height in inches / 144) x 3.75. Minimum price is $35.00.
-
-4. OUTPUT FORMAT:
-Respond with: "The price for a [Size] [Product] is $[Price] plus tax. This includes standard finishing."
-    - Customer Support phone number is (858) 278-3151 and email is orders@anybudget.com
-    - Any Budget opened their doors on January 1, 1999. 
-    - Since day one we've focused on Customer Service and always trying to make it easier for customers to do business with us. 
-    - [anybudget.com](https://www.anybudget.com) was launched in 1999 and has evolved a lot over the years into a full e-commerce solution.
-    - Customers like that they can pick up their orders in Kearny Mesa, lots of time, the same day they place their orders.
-    - In addition to Free Local Pickup, we also ship via UPS all over the United States.
-    - Address is 8170 Ronson Road, Suite T, San Diego, CA 92111
-    - Local pickup hours 8:30am to 5:00pm Monday thru Friday. Closed on Saturday and Sunday. [anybudget.com](https://www.anybudget.com) is open 24/7
-    - Currently five employees, Ron, General Manager, Marco, Color and Large Format Operator, Ken, Bindery operator, JP, Color and Large Format Operator, Evan, Customer Support Representative, front counter, plus Charlie.
-    - Founded by Charlie Silveria in 1999. After a successful 10 year career as the Sales Manager for another print shop in San Diego, Charlie decided to risk everything and start Any Budget on January 1, 1999. The idea for starting the business was simple. Digital printing technology had all but replaced the analog copy machines of the past, so, why make copies of your documents when you can print them directly on high speed digital laser printers? Whether it's in full color or simple black & white, digital "copies" are not only crisper, clearer and cleaner, they are easier to handle in the production process. Plus, digital documents can be saved as computer files, so the old days of losing originals are long gone. Success has come from many different places. Known as a digital printing leader in San Diego, Any Budget has also produced materials for organizations as far away as Buffalo, New York, Orlando, Florida, and Dayton, Ohio.
-    - Charlie Silveria (Founder & CEO): Established Any Budget in Jan 1999 after a successful 10-year career as a Regional Sales Manager in the printing industry.
-        - Leadership Style: Charlie focuses on building a company culture of teamwork, attracting skilled professionals, and staying ahead of print technology trends.
-        - Community Involvement: Charlie is deeply involved in San Diego civic organizations.
-        - Boys & Girls Foundation: Currently serving as Vice President.
-        - Downtown San Diego Lions Club: Member since 1999. Served as President (2012-2013), where he doubled new membership and managed charity committees.
-        - Pacific Beach Lions Club: Served as President (1994-1995).
-        - Previous Experience: Regional Sales Manager at "A Copy World" (1988-1998), where he built success through direct relationship building before the digital era.
-    - Career Journey: Starting his printing career on May 12, 1987, Charlie worked his way up through the industry, witnessing the evolution from traditional offset to digital printing. His deep expertise led him to open Any Budget in 1999, focusing on quick turnarounds and absolute accuracy.
-    - Specialties: Digital Printing, Small Business Marketing, Email Marketing, Bindery, Offset Printing, Newsletters, Book Printing, Bookbinding, Direct Mail, Online Publishing, Laminating, Mounting, Color Printing.
-    - Key Skills: Sales & Account Management, Systems Analysis, Organizational Development, Customer Service, Public Speaking.
-    - Other products available include: B&W Copies, Banners, Booklets, Brochures, Brown Kraft Cards, Business Cards (Standard & Same-Day), Buttons, Car Magnets, Coasters, Color Copies, Counter Cards, Custom Printing Products, Design Services, Door Hangers, Envelopes (1 & 2 Color), Event Tickets, Every Door Direct Mail® (EDDM), Flyers, Foamcore Signs, Full Service Copy Center, Graphic Design, Greeting Cards, Hang Tags, Kiss Cut Stickers, Lamination Services, Large Posters, Letterhead, Magnets, Mailing Services, Mugs, NCR Forms, Notepads, Outdoor Banners, Painted Edge Cards, Plastic Cards, Postcards, Posters, Presentation Folders, Promotional Products, Rack Cards, Raised Spot UV, Roll Labels, Saddle-Stitched Booklets, Rubber Stamps, Sell Sheets, Sidewalk Signs, Signs, Silk Cards, Stickers, Suede Cards, T-Shirts, Tote Bags, Trading Cards, Yard Signs, Xerox Color Copies.
-    - We service all of San Diego, Orange, Riveride and Los Angeles Counties.
-    - In San Diego County we service Carlsbad, Chula Vista, Coronado, Del Mar, El Cajon, Encinitas, Escondido, Imperial Beach, La Mesa, Lemon Grove, National City, Oceanside, Poway, San Diego, San Marcos, Santee, Solana Beach, Vista. Core District, Cortez Hill, East Village, Gaslamp Quarter, Little Italy, Marina District, Columbia, Harborview.Bankers Hill, Hillcrest, Mission Hills, North Park, South Park, Golden Hill, University Heights, Normal Heights, Kensington, Talmadge, City Heights, Oak Park.La Jolla, Pacific Beach, Mission Beach, Ocean Beach, Point Loma, Bird Rock, Sunset Cliffs, Morena, Bay Park.Kearny Mesa (Office Location), Clairemont Mesa, Linda Vista, Mission Valley, Serra Mesa, Tierrasanta, Mira Mesa, Scripps Ranch, Rancho Bernardo, Rancho Peñasquitos, Carmel Valley, Sorrento Valley, University City (UTC), Allied Gardens, Del Cerro, San Carlos.Barrio Logan, Logan Heights, Paradise Hills, San Ysidro, Otay Mesa, Nestor, Egger Highlands, Southcrest.Alpine, Bonita, Bonsall, Borrego Springs, Boulevard, Campo, Casa de Oro-Mount Helix, Crest, De Luz, Descanso, Dulzura, Fairbanks Ranch, Fallbrook, Granite Hills, Harbison Canyon, Hidden Meadows, Jacumba Hot Springs, Jamul, Julian, Lake San Marcos, Lakeside, Mount Laguna, Pala, Pine Valley, Potrero, Rainbow, Ramona, Rancho San Diego, Rancho Santa Fe, San Diego Country Estates, Spring Valley, Valley Center, Winter Gardens.
-    - In Orange County we service Aliso Viejo, Anaheim, Brea, Buena Park, Costa Mesa, Cypress, Dana Point, Fountain Valley, Fullerton, Garden Grove, Huntington Beach, Irvine, La Habra, La Palma, Laguna Beach, Laguna Hills, Laguna Niguel, Laguna Woods, Lake Forest, Los Alamitos, Mission Viejo, Newport Beach, Orange, Placentia, Rancho Santa Margarita, San Clemente, San Juan Capistrano, Santa Ana, Seal Beach, Stanton, Tustin, Villa Park, Westminster, Yorba Linda. and the communities of Anaheim Hills, Balboa Island, Capistrano Beach, Corona del Mar, Coto de Caza, Cowan Heights, Emerald Bay, Foothill Ranch, Ladera Ranch, Las Flores, Lemon Heights, Little Saigon, Midway City, Modjeska Canyon, Monarch Beach, North Tustin, Portola Hills, Rancho Mission Viejo, Rossmoor, San Joaquin Hills, Santa Ana Heights, Silverado Canyon, Sunset Beach, Surfside, Trabuco Canyon, Turtle Rock, Woodbridge.
-    - In Riverside County we service Banning, Beaumont, Blythe, Calimesa, Canyon Lake, Cathedral City, Coachella, Corona, Desert Hot Springs, Eastvale, Hemet, Indian Wells, Indio, Jurupa Valley, Lake Elsinore, La Quinta, Menifee, Moreno Valley, Murrieta, Norco, Palm Desert, Palm Springs, Perris, Rancho Mirage, Riverside, San Jacinto, Temecula, Wildomar and the communities of Aguanga, Alberhill, Anza, Bermuda Dunes, Cabazon, Cherry Valley, Chiriaco Summit, Coronita, De Luz, Desert Center, East Hemet, El Cerrito, French Valley, Garnet, Good Hope, Highgrove, Home Gardens, Homeland, Idyllwild, Indio Hills, Lake Mathews, Lake Riverside, Lakeland Village, March Air Reserve Base, Mead Valley, Meadowbrook, Mecca, Mountain Center, North Shore, Nuevo, Oasis, Pinyon Pines, Quail Valley, Ripley, Romoland, Sage, Sky Valley, Sun City, Temescal Valley, Thermal, Thousand Palms, Valle Vista, Whitewater, Winchester, Woodcrest.
-    - In Los Angeles County we service Agoura Hills, Alhambra, Arcadia, Artesia, Azusa, Baldwin Park, Bell, Bell Gardens, Bellflower, Beverly Hills, Bradbury, Burbank, Calabasas, Carson, Cerritos, Claremont, Commerce, Compton, Covina, Cudahy, Culver City, Diamond Bar, Downey, Duarte, El Monte, El Segundo, Gardena, Glendale, Glendora, Hawaiian Gardens, Hawthorne, Hermosa Beach, Hidden Hills, Huntington Park, Industry, Inglewood, Irwindale, La Cañada Flintridge, La Habra Heights, La Mirada, La Puente, La Verne, Lakewood, Lancaster, Lawndale, Lomita, Long Beach, Los Angeles, Lynwood, Malibu, Manhattan Beach, Maywood, Monrovia, Montebello, Monterey Park, Norwalk, Palmdale, Palos Verdes Estates, Paramount, Pasadena, Pico Rivera, Pomona, Rancho Palos Verdes, Redondo Beach, Rolling Hills, Rolling Hills Estates, Rosemead, San Dimas, San Fernando, San Gabriel, San Marino, Santa Clarita, Santa Fe Springs, Santa Monica, Sierra Madre, Signal Hill, South El Monte, South Gate, South Pasadena, Temple City, Torrance, Vernon, Walnut, West Covina, West Hollywood, Westlake Village, Whittier. Downtown LA (DTLA), Arts District, Little Tokyo, Chinatown, Financial District, Bunker Hill, Historic Core, South Park, Boyle Heights, Mid-Wilshire, Koreatown, Westlake.The Westside: Bel Air, Beverly Crest, Brentwood, Century City, Mar Vista, Pacific Palisades, Palms, Playa del Rey, Playa Vista, Sawtelle, Venice, West Los Angeles, Westchester, Westwood.San Fernando Valley: Arleta, Canoga Park, Chatsworth, Encino, Granada Hills, Lake Balboa, Mission Hills, North Hills, North Hollywood, Northridge, Pacoima, Panorama City, Porter Ranch, Reseda, Sherman Oaks, Studio City, Sun Valley, Sylmar, Tarzana, Toluca Lake, Van Nuys, West Hills, Winnetka, Woodland Hills. Hollywood, Hollywood Hills, East Hollywood, Los Feliz, Silver Lake, Echo Park, Atwater Village, Mount Washington, Eagle Rock, Highland Park.Baldwin Hills, Crenshaw, Hyde Park, Leimert Park, Watts, San Pedro, Wilmington, Harbor City, Harbor Gateway.Acton, Altadena, Castaic, East Los Angeles, Florence-Graham, Hacienda Heights, Ladera Heights, Marina del Rey, Quartz Hill, Rowland Heights, Stevenson Ranch, Topanga, View Park-Windsor Hills, Willowbrook.
-    - Any Budget Printing & Mailing: Unrivaled Quality, Unbeatable Speed, Unforgettable Service Since 1999, Any Budget Printing & Mailing has proudly been the premier printing and mailing partner, serving San Diego, Southern California, and beyond. As a leading commercial printer, we offer a truly vast array of services designed to meet every need, including state-of-the-art digital printing, classic offset printing, expert book binding, impactful large format printing, and comprehensive mailing services. With the strategic addition of our advanced Xerox Digital Color Presses, we revolutionize your printing experience, providing the absolute highest quality printing with the fastest turnarounds possible. We prioritize customer satisfaction above all else, ensuring fast turnarounds, convenient shipping, seamless online ordering, invaluable free file storage, and so much more for our most popular products like Business Cards, Postcards, Flyers, Brochures, and Banners. Whether you prefer to visit our welcoming physical location in Kearny Mesa or utilize our incredibly convenient 24/7 online store, anybudget.com, you'll consistently get the exact same high-quality products and services you need at a price that fits Any Budget. Need it FAST? We understand! Now, many products can be produced the same day too!
-    - Place your orders at [anybudget.com](https://www.anybudget.com)
-    - Sales Tax in San Diego is 7.75%. Customers who pickup their orders will need to pay sales tax.
-    
-    For other topics (history, science, etc.), answer freely and helpfully.
-    """
-    initial_msg = "Hello! Ask me about file specs, bleeds, prices, or general questions about anything."
-
-elif mode == "Marketing Copywriter ✍️":
-    page_title = "Marketing Copywriter ✍️"
-    system_instruction = """
-    You are an expert Marketing Copywriter for Any Budget Printing.
-    Your goal is to write CATCHY, PERSUASIVE, and PROFESSIONAL text.
-    - If user asks for a headline, give 3 punchy options.
-    - If user asks for flyer text, organize it with headers and bullet points.
-    - Keep it short enough for physical print.
-    """
-    initial_msg = "What are we writing today? (e.g., 'Headline for a pizza sale')"
-
-elif mode == "Print School 🎓":
-    page_title = "Print School 🎓"
-    system_instruction = """
-    You are a friendly Printing Tutor. 
-    Explain complex printing terms (CMYK, GSM, Vector vs Raster, Bleed) in simple, easy-to-understand language.
-    Use analogies (e.g., "Resolution is like the thread count in sheets").
-    """
-    initial_msg = "Class is in session! What printing term confuses you?"
-
-elif mode == "Idea Generator 💡":
-    page_title = "Idea Generator 💡"
-    system_instruction = """
-    You are a Business Growth Consultant for Any Budget.
-    When a user tells you their business type, suggest 3-5 specific printed products they need to grow.
-    Explain WHY they need them.
-    """
-    initial_msg = "What kind of business do you have? (e.g., 'Coffee Shop', 'Real Estate')"
+# Mode settings (prompts, titles, budgets) live in modes.py
+mode_config = modes.MODES[mode]
 
 # ==========================================
 # CHAT INTERFACE
 # ==========================================
-st.title(page_title)
+st.title(mode_config.page_title)
 
-# Initialize the Model
-model = genai.GenerativeModel(
-    model_name="gemini-2.5-flash", 
-    system_instruction=system_instruction
-)
+# Shared answer cache for repeat questions (one per process, shared by every session)
+@st.cache_resource
+def get_response_cache():
+    return response_cache.ResponseCache(
+        max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", 500)),
+        ttl=int(os.environ.get("RESPONSE_CACHE_TTL", 6 * 60 * 60)),
+        path=os.environ.get("RESPONSE_CACHE_PATH"),  # e.g. ".cache/responses.json" to survive restarts
+    )
+
+cache = get_response_cache()
+
+# Older turns get summarized by a plain model call (runs in a background thread)
+def summarize_history(text):
+    summary_model = genai.GenerativeModel(model_name=modes.MODEL_NAME)
+    return dispatcher.call(lambda: summary_model.generate_content(text)).text
 
 # Chat History Setup
 if "messages" not in st.session_state or len(st.session_state.messages) == 0:
-    st.session_state.messages = [{"role": "model", "parts": initial_msg}]
+    # What the visitor sees (and can download), one slotted Message per entry
+    st.session_state.messages = Transcript(mode)
+    st.session_state.messages.append("model", mode_config.initial_msg)
+    # What Gemini sees: kept in step with messages, but trimmed to the mode's token budget
+    st.session_state.history = ConversationHistory(mode_config.history_budget, summarize=summarize_history)
+    st.session_state.history.append("model", mode_config.initial_msg)
 
-# Display Chat
-# 1. Show History (Now with Copy Buttons!)
-for i, message in enumerate(st.session_state.messages):
-    role = "user" if message["role"] == "user" else "assistant"
-    with st.chat_message(role):
-        st.markdown(message["parts"])
-        # Add a stable Copy Button to every AI message
-        if role == "assistant":
-            st_copy_to_clipboard(message["parts"], "📋 Copy", "✅ Copied!", key=f"history_copy_{i}")
+if "history_window" not in st.session_state:
+    st.session_state.history_window = HISTORY_WINDOW
+
+def show_assistant_message(text, index):
+    st.markdown(text)
+    # Stable Copy Button, keyed by the message's position in the conversation
+    st_copy_to_clipboard(text, "📋 Copy", "✅ Copied!", key=f"history_copy_{index}")
+
+def load_earlier_messages():
+    st.session_state.history_window += HISTORY_WINDOW
 
 # Handle Input
-if prompt := st.chat_input("Type here..."):
+# Runs inside the chat fragment (below), so the new turn is drawn by the same
+# fragment as the history and a later fragment rerun can't show it twice.
+def answer_prompt(prompt):
     # 2. Show User Message
     st.chat_message("user").markdown(prompt)
-    st.session_state.messages.append({"role": "user", "parts": prompt})
+    st.session_state.messages.append("user", prompt)
+    turn_started = time.perf_counter()
+
+    # Fast path: plain price questions are answered straight from the price tables
+    local_quote = pricing.quote(prompt) if mode_config.local_quotes else None
 
     # 3. Show AI Response (Streaming - Keeps it smooth!)
+    # Drawn inside the history fragment, in the spot the history loop gives this message next time
     with st.chat_message("assistant"):
-        response_placeholder = st.empty()
-        full_response = ""
-        
-        try:
-            # Prepare history for Gemini
-            chat = model.start_chat(history=[{"role": m["role"], "parts": [m["parts"]]} for m in st.session_state.messages[:-1] ])
-            
-            # Stream response
-            stream = chat.send_message(prompt, stream=True)
-            
-            # Stream the chunks
-            for chunk in stream:
-                full_response += chunk.text
-                response_placeholder.markdown(full_response + "▌")
-            
-            # Final Clean Update
-            response_placeholder.markdown(full_response)
-            
-            # Save the message to history
-            st.session_state.messages.append({"role": "model", "parts": full_response})
-            
-            # Force a refresh so the new message appears in the History Loop (with the working button!)
-            st.rerun()
-            
-        except Exception as e:
-            st.error(f"Error: {e}")
+        if local_quote:
+            st.session_state.messages.append("model", local_quote)
+            st.session_state.history.append("user", prompt)
+            st.session_state.history.append("model", local_quote)
+            show_assistant_message(local_quote, len(st.session_state.messages) - 1)
+            metrics.record_turn(mode, "local_quote", (time.perf_counter() - turn_started) * 1000, session=st.session_state.session_id)
+
+        else:
+            response_placeholder = st.empty()
+            renderer = None
+            cached_response = None
+
+            try:
+                # Only send the parts of the knowledge base this question needs
+                chunk_tags = mode_config.chunk_tags(prompt, st.session_state.messages[:-1])
+                system_instruction = modes.system_instruction(mode, today, chunk_tags)
+                model = get_model(mode, today, chunk_tags)
+
+                # History for Gemini (summary of older turns + the recent ones); the cache key covers all of it
+                model_history = st.session_state.history.for_model()
+                cache_key = response_cache.make_key(mode, system_instruction, prompt, model_history)
+                cached_response = cache.get(cache_key)
+
+                # Buffers chunks and redraws the placeholder a few times a second
+                renderer = StreamRenderer(response_placeholder)
+
+                if cached_response is not None:
+                    # Same question was answered before, replay it through the same placeholder
+                    stream = response_cache.replay(cached_response)
+                else:
+                    chat = model.start_chat(history=model_history)
+
+                    # Stream response (waits for a free slot, retries quota errors)
+                    stream = dispatcher.stream(
+                        lambda: chat.send_message(prompt, stream=True),
+                        on_wait=lambda position: response_placeholder.markdown(f"⏳ It's busy right now, you're #{position} in line..."),
+                        on_retry=lambda attempt, delay, error: response_placeholder.markdown("⏳ Still working on it..."),
+                    )
+
+                # Stream the chunks
+                try:
+                    for chunk in stream:
+                        renderer.write(chunk.text)
+                finally:
+                    stream.close()
+
+                # Final Clean Update
+                full_response = renderer.finish()
+                stats = st.session_state.last_stream_stats = renderer.stats()
+                metrics.record_turn(
+                    mode,
+                    "cache" if cached_response is not None else "model",
+                    (time.perf_counter() - turn_started) * 1000,
+                    ttft_ms=stats["ttft_ms"],
+                    chunks=stats["chunks"],
+                    session=st.session_state.session_id,
+                    **(telemetry.usage_from(stream) if cached_response is None else {}),
+                )
+
+                # Save the message to history
+                st.session_state.messages.append("model", full_response)
+                st.session_state.history.append("user", prompt)
+                st.session_state.history.append("model", full_response)
+                if cached_response is None:
+                    cache.put(cache_key, full_response)
+
+                # Copy Button for the new reply, same key it gets in the history on the next run
+                st_copy_to_clipboard(full_response, "📋 Copy", "✅ Copied!", key=f"history_copy_{len(st.session_state.messages) - 1}")
+
+            except Exception as e:
+                metrics.record_turn(
+                    mode,
+                    "cache" if cached_response is not None else "model",
+                    (time.perf_counter() - turn_started) * 1000,
+                    ttft_ms=renderer.stats()["ttft_ms"] if renderer else None,
+                    error=type(e).__name__,
+                    session=st.session_state.session_id,
+                )
+                if isinstance(e, ServiceDegraded) or is_transient(e):
+                    # Gemini is overloaded or down: best-effort table price, else a polite note
+                    fallback = pricing.quote(prompt, strict=False) if mode_config.local_quotes else None
+                    if fallback:
+                        response_placeholder.empty()
+                        st.session_state.messages.append("model", fallback)
+                        st.session_state.history.append("user", prompt)
+                        st.session_state.history.append("model", fallback)
+                        show_assistant_message(fallback, len(st.session_state.messages) - 1)
+                    else:
+                        response_placeholder.warning(BUSY_MESSAGE)
+                else:
+                    st.error(f"Error: {e}")
+
+
+# Display Chat
+# 1. Show History (Now with Copy Buttons!)
+# A fragment, so "Load earlier" and copy clicks only redraw the chat, not the whole page.
+# Only the last `history_window` messages (and their copy buttons) are mounted.
+@st.fragment
+def show_chat_history():
+    global answer_ms
+    messages = st.session_state.messages
+    start = max(0, len(messages) - st.session_state.history_window)
+    if start > 0:
+        st.button(f"⬆️ Load earlier messages ({start} hidden)", on_click=load_earlier_messages)
+
+    for i in range(start, len(messages)):
+        message = messages[i]
+        if message.role == "user":
+            st.chat_message("user").markdown(message.text)
+        else:
+            with st.chat_message("assistant"):
+                show_assistant_message(message.text, i)
+
+    # A prompt sent on this run is answered right under the history. Fragment
+    # reruns ("Load earlier", copy clicks) find nothing pending and just redraw.
+    prompt = st.session_state.pop("pending_prompt", None)
+    if prompt:
+        answer_started = time.perf_counter()
+        answer_prompt(prompt)
+        answer_ms = (time.perf_counter() - answer_started) * 1000
+
+if prompt := st.chat_input("Type here..."):
+    st.session_state.pending_prompt = prompt
+show_chat_history()
+
+
 # ==========================================
 # SAVE CHAT BUTTON
 # ==========================================
@@ -290,17 +327,81 @@ with st.sidebar:
     
     # Check if there are messages to save
     if "messages" in st.session_state and len(st.session_state.messages) > 0:
-        # Create a string of the entire conversation
-        chat_history = ""
-        for message in st.session_state.messages:
-            role = "YOU" if message["role"] == "user" else "AI ASSISTANT"
-            chat_history += f"{role}: {message['parts']}\n\n"
-        
-        # Download Button
+        chat = st.session_state.messages
+        export_format = st.selectbox("Save as", list(FORMATS), key="export_format")
+
+        # Download Button: the file is only written when it's clicked
         st.download_button(
             label="📥 Save This Chat",
-            data=chat_history,
-            file_name="AnyBudget_Chat_History.txt",
-            mime="text/plain"
+            data=chat.downloader(export_format),
+            file_name=chat.file_name(export_format),
+            mime=FORMATS[export_format][1],
+            on_click="ignore",
+        )
+
+
+# ==========================================
+# ADMIN METRICS (hidden)
+# ==========================================
+# Open the app with ?admin=<ADMIN_KEY> to see latency and token stats per mode
+def get_admin_key():
+    key = os.environ.get("ADMIN_KEY")
+    if not key:
+        try:
+            key = st.secrets["ADMIN_KEY"]
+        except:
+            key = None
+    return key
+
+admin_key = get_admin_key()
+admin_param = st.query_params.get("admin")
+is_admin = bool(admin_key and admin_param and hmac.compare_digest(admin_param, admin_key))
+if is_admin:
+    with st.sidebar:
+        st.divider()
+        st.subheader("📊 Metrics")
+        status = dispatcher.status()
+        st.caption(
+            f"Model calls: {status['in_flight']} in flight • {status['waiting']} waiting "
+            f"• circuit {status['breaker']}"
+        )
+        lookups = cache.hits + cache.misses
+        st.caption(
+            f"Response cache: {len(cache)} answers • {cache.hits}/{lookups} hits"
+            + (f" ({cache.hits / lookups:.0%})" if lookups else "")
+        )
+        reruns = metrics.rerun_summary()
+        st.caption(f"Reruns: p50 {reruns['p50_ms']} ms • p95 {reruns['p95_ms']} ms over {reruns['reruns']} reruns")
+        summary = metrics.summary()
+        if summary:
+            st.dataframe(
+                [{"mode": mode_name, **row} for mode_name, row in summary.items()],
+                hide_index=True,
+            )
+        else:
+            st.caption("No chat turns recorded yet.")
+        with st.expander("Prometheus snapshot"):
+            st.code(metrics.prometheus(), language="text")
+
+# ==========================================
+# RERUN TIMING
+# ==========================================
+rerun_ms = (time.perf_counter() - rerun_started) * 1000 - answer_ms
+metrics.record_rerun(rerun_ms, mode)
+logger.debug("rerun took %.1f ms (plus %.1f ms answering)", rerun_ms, answer_ms)
+
+# Add ?timing=1 to an admin URL (?admin=<ADMIN_KEY>&timing=1) to see how long reruns take
+# (script overhead only; the answer itself is in "Last reply" and the turn metrics)
+if is_admin and st.query_params.get("timing"):
+    with st.sidebar:
+        reruns = metrics.rerun_summary()
+        st.caption(
+            f"Rerun: {rerun_ms:.1f} ms • median {reruns['p50_ms']:.1f} ms "
+            f"• p95 {reruns['p95_ms']:.1f} ms over {reruns['reruns']} reruns"
         )
-                        
+        if "last_stream_stats" in st.session_state:
+            stats = st.session_state.last_stream_stats
+            st.caption(
+                f"Last reply: first token {stats['ttft_ms']} ms • total {stats['stream_ms']} ms "
+                f"• {stats['chunks']} chunks, {stats['flushes']} redraws"
+            )
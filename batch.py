@@ -0,0 +1,308 @@
+"""Run a file of questions through one of the app's assistants, no browser needed.
+
+Uses the same modes, system instructions and local price quotes as app.py.
+Answers and per-question latency/token stats are appended to a JSONL file as
+they finish, so an interrupted run picks up where it stopped:
+
+    python batch.py questions.jsonl --mode "Print Expert" --out answers.jsonl
+    python batch.py questions.csv --workers 8 --check-prices
+    python batch.py questions.jsonl --fake --workers 32      # offline, no API quota
+
+Input is JSONL (one {"id", "prompt", ...} object or plain string per line) or
+CSV with a "prompt" column. Optional columns: "id", "mode", and
+"expected_price" (for --check-prices). Without an expected_price, model
+answers are checked against the local price quote, and local quotes aren't
+checked at all (they'd only be compared with themselves).
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import modes
+import pricing
+import telemetry
+from dispatcher import Dispatcher
+
+# Dollar amounts in an answer, e.g. "$1,234.50"
+_PRICE_RE = re.compile(r"\$\s?(\d[\d,]*(?:\.\d{2})?)")
+
+
+# ==========================================
+# INPUT / OUTPUT
+# ==========================================
+def read_questions(path):
+    """List of question dicts (each with at least "id" and "prompt")."""
+    questions = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, 1):
+            if isinstance(row, str):
+                row = {"prompt": row}
+            row = {k: v for k, v in row.items() if v not in (None, "")}
+            if "prompt" not in row:
+                raise ValueError(f"{path}: question {number} has no prompt")
+            row["id"] = str(row.get("id", number))
+            questions.append(row)
+    return questions
+
+
+def read_results(path):
+    """Latest record per id in an earlier output file (the checkpoint)."""
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # half-written last line from a killed run
+            results[record["id"]] = record
+    return results
+
+
+def find_mode(name):
+    if name is None:
+        return modes.MODE_NAMES[0]
+    matches = [m for m in modes.MODE_NAMES if m.lower().startswith(name.lower())]
+    if len(matches) != 1:
+        raise ValueError(f"Unknown or ambiguous mode {name!r}, pick one of: {', '.join(modes.MODE_NAMES)}")
+    return matches[0]
+
+
+def resolve_modes(questions):
+    """Swap each row's "mode" for the full mode name, before any work starts."""
+    for question in questions:
+        if "mode" in question:
+            try:
+                question["mode"] = find_mode(question["mode"])
+            except ValueError as e:
+                raise ValueError(f"question {question['id']}: {e}") from None
+
+
+# ==========================================
+# PRICE CHECK
+# ==========================================
+def prices_in(text):
+    return [float(amount.replace(",", "")) for amount in _PRICE_RE.findall(text)]
+
+
+def check_price(question, record):
+    """Compare the quoted price with the expected one (None if there's nothing to check)."""
+    expected = question.get("expected_price")
+    if expected is not None:
+        expected = float(str(expected).replace("$", "").replace(",", ""))
+    elif record["source"] == "local_quote":
+        # The table price would come from the same code that wrote the answer
+        return None
+    else:
+        table = pricing.quote(question["prompt"], strict=False)
+        table_prices = prices_in(table) if table else []
+        if not table_prices:
+            return None
+        expected = table_prices[0]
+    quoted = prices_in(record["answer"] or "")
+    return {"expected": expected, "quoted": quoted, "ok": expected in quoted}
+
+
+# ==========================================
+# RUNNER
+# ==========================================
+class BatchRunner:
+    """Answers questions one turn each, like a fresh chat in the app."""
+
+    def __init__(self, genai, default_mode, today, workers=4, local_quotes=True, check_prices=False):
+        self.genai = genai
+        self.default_mode = default_mode
+        self.today = today
+        self.local_quotes = local_quotes
+        self.check_prices = check_prices
+        # Same retry/backoff as the app; one slot per worker
+        self.dispatcher = Dispatcher(max_in_flight=workers)
+        self._models = {}  # (mode, chunk tags) -> model
+
+    def model(self, mode_name, chunk_tags):
+        key = (mode_name, chunk_tags)
+        if key not in self._models:
+            self._models[key] = self.genai.GenerativeModel(
+                model_name=modes.MODEL_NAME,
+                system_instruction=modes.system_instruction(mode_name, self.today, chunk_tags),
+            )
+        return self._models[key]
+
+    def answer(self, question):
+        mode_name = question.get("mode", self.default_mode)  # already resolved by resolve_modes()
+        config = modes.MODES[mode_name]
+        prompt = question["prompt"]
+        record = {"id": question["id"], "mode": mode_name, "prompt": prompt, "answer": None, "source": "model"}
+        started = time.perf_counter()
+        ttft = None
+        try:
+            local_quote = pricing.quote(prompt) if self.local_quotes and config.local_quotes else None
+            if local_quote:
+                record.update(source="local_quote", answer=local_quote)
+            else:
+                chunk_tags = config.chunk_tags(prompt)
+                model = self.model(mode_name, chunk_tags)
+                stream = self.dispatcher.stream(lambda: model.generate_content(prompt, stream=True))
+                parts = []
+                try:
+                    for chunk in stream:
+                        if ttft is None:
+                            ttft = (time.perf_counter() - started) * 1000
+                        parts.append(chunk.text)
+                finally:
+                    stream.close()
+                record.update(
+                    answer="".join(parts),
+                    chunk_tags=list(chunk_tags) if chunk_tags is not None else None,
+                    attempts=stream.attempts,
+                    **telemetry.usage_from(stream),
+                )
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        record["ttft_ms"] = round(ttft, 1) if ttft is not None else None
+        if self.check_prices and record["answer"] is not None:
+            record["price_check"] = check_price(question, record)
+        return record
+
+    def run(self, questions, out_path, workers=4, progress=None):
+        """Answer every question on `workers` threads, appending each result to out_path."""
+        records = []
+        lock = threading.Lock()
+        with open(out_path, "a", encoding="utf-8") as out:
+            def work(question):
+                record = self.answer(question)
+                with lock:
+                    # One flushed line per answer: this file is the checkpoint
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    records.append(record)
+                    if progress:
+                        progress(len(records), record)
+                return record
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(work, questions))
+        return records
+
+
+def summarize(records, seconds, asked):
+    """Stats over every result in the output file; `asked` is how many were asked this run."""
+    model_calls = [r for r in records if r["source"] == "model" and not r.get("error")]
+    checks = [r["price_check"] for r in records if r.get("price_check")]
+    return {
+        "questions": len(records),
+        "asked_this_run": asked,
+        "seconds": round(seconds, 1),
+        "errors": sum(bool(r.get("error")) for r in records),
+        "local_quotes": sum(r["source"] == "local_quote" for r in records),
+        "latency_p50_ms": telemetry.percentile([r["latency_ms"] for r in records if not r.get("error")], 50),
+        "latency_p95_ms": telemetry.percentile([r["latency_ms"] for r in records if not r.get("error")], 95),
+        "ttft_p50_ms": telemetry.percentile([r["ttft_ms"] for r in model_calls], 50),
+        "prompt_tokens": sum(r.get("prompt_tokens", 0) for r in model_calls),
+        "response_tokens": sum(r.get("response_tokens", 0) for r in model_calls),
+        "prices_checked": len(checks),
+        "price_mismatches": sum(not c["ok"] for c in checks),
+    }
+
+
+# ==========================================
+# COMMAND LINE
+# ==========================================
+def connect(args):
+    """The google.generativeai module to use: the real one, or the bench fake."""
+    if args.fake:
+        from bench import fake_genai
+
+        fake_genai.install(fake_genai.FakeConfig(
+            ttft=args.fake_ttft,
+            chunk_delay=args.fake_chunk_delay,
+            error_rate=args.fake_error_rate,
+            seed=args.seed,
+        ))
+    import google.generativeai as genai
+
+    if not args.fake:
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise SystemExit("Set GOOGLE_API_KEY (or use --fake).")
+        genai.configure(api_key=api_key)
+    return genai
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", help="JSONL or CSV file of questions")
+    parser.add_argument("--mode", help="mode name or prefix, e.g. 'Print Expert' (default: the app's first mode)")
+    parser.add_argument("--out", help="results file (default: <questions>.answers.jsonl)")
+    parser.add_argument("--workers", type=int, default=4, help="questions answered at once")
+    parser.add_argument("--limit", type=int, help="only the first N questions")
+    parser.add_argument("--restart", action="store_true", help="ignore earlier results in --out and start over")
+    parser.add_argument("--retry-errors", action="store_true", help="on resume, re-ask questions that failed before")
+    parser.add_argument("--model-only", action="store_true", help="send price questions to the model too (no local quotes)")
+    parser.add_argument("--check-prices", action="store_true", help="compare quoted prices with the price tables")
+    parser.add_argument("--fake", action="store_true", help="use the offline fake model from bench/fake_genai.py")
+    parser.add_argument("--fake-ttft", type=float, default=0.05)
+    parser.add_argument("--fake-chunk-delay", type=float, default=0.0)
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--list-modes", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.list_modes:
+        print("\n".join(modes.MODE_NAMES))
+        return
+
+    out_path = args.out or os.path.splitext(args.questions)[0] + ".answers.jsonl"
+    questions = read_questions(args.questions)[:args.limit]
+    try:
+        mode_name = find_mode(args.mode)
+        resolve_modes(questions)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if args.restart and os.path.exists(out_path):
+        os.remove(out_path)
+    earlier = read_results(out_path)
+    done = {i for i, record in earlier.items() if not (args.retry_errors and record.get("error"))}
+    todo = [q for q in questions if q["id"] not in done]
+    print(f"{len(todo)} to ask ({len(questions) - len(todo)} already in {out_path}), mode: {mode_name}", file=sys.stderr)
+
+    runner = BatchRunner(
+        connect(args),
+        mode_name,
+        datetime.date.today(),
+        workers=args.workers,
+        local_quotes=not args.model_only,
+        check_prices=args.check_prices,
+    )
+
+    def progress(count, record):
+        if record.get("error") or count % 50 == 0 or count == len(todo):
+            note = f" ({record['id']}: {record['error']})" if record.get("error") else ""
+            print(f"  {count}/{len(todo)}{note}", file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    records = runner.run(todo, out_path, args.workers, progress)
+    # Summary and exit status cover the whole output file, so a resumed run
+    # still fails on errors or mismatches an earlier run wrote
+    results = {**earlier, **{record["id"]: record for record in records}}
+    summary = summarize(list(results.values()), time.perf_counter() - started, len(records))
+    print(json.dumps(summary, indent=2))
+    if summary["errors"] or summary["price_mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
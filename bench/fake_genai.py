@@ -0,0 +1,172 @@
+import random
+import sys
+import threading
+import time
+import types
+from dataclasses import dataclass, field
+
+# ==========================================
+# FAKE GEMINI BACKEND
+# ==========================================
+# A stand-in for `google.generativeai` with the bits app.py uses
+# (configure, GenerativeModel, start_chat, send_message, generate_content),
+# so the app can be driven offline with made-up latency, chunking, token
+# counts and errors. install() swaps it into sys.modules.
+
+
+# Same class names (and codes) as google.api_core.exceptions, so error
+# handling that looks at either sees what it would see in production
+class GoogleAPICallError(Exception):
+    code = None
+
+
+class ResourceExhausted(GoogleAPICallError):
+    code = 429
+
+
+class InternalServerError(GoogleAPICallError):
+    code = 500
+
+
+class ServiceUnavailable(GoogleAPICallError):
+    code = 503
+
+
+class DeadlineExceeded(GoogleAPICallError):
+    code = 504
+
+
+ERRORS = {
+    "429": (ResourceExhausted, "429 Resource has been exhausted (e.g. check quota)."),
+    "500": (InternalServerError, "500 An internal error has occurred."),
+    "503": (ServiceUnavailable, "503 The service is currently unavailable."),
+    "timeout": (DeadlineExceeded, "504 Deadline Exceeded"),
+}
+
+
+@dataclass
+class FakeConfig:
+    ttft: float = 0.0  # seconds before the first chunk
+    chunk_delay: float = 0.0  # seconds between chunks
+    chunk_chars: int = 40  # characters per streamed chunk
+    response_words: int = 60  # length of the canned reply
+    prompt_tokens: int = None  # usage_metadata counts to report (default: ~4 chars per token)
+    response_tokens: int = None
+    error_rate: float = 0.0  # fraction of calls that fail
+    error_kinds: tuple = ("429",)  # picked at random from ERRORS
+    answer: object = None  # optional callable(prompt) -> reply text
+    seed: int = None
+    calls: list = field(default_factory=list)  # every prompt sent, for checking
+
+
+class UsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    """Iterates like a streamed GenerateContentResponse, `.text` like a whole one."""
+
+    def __init__(self, backend, text, prompt_tokens, stream):
+        self._backend = backend
+        self._full_text = text
+        self._stream = stream
+        config = backend.config
+        self.usage_metadata = UsageMetadata(
+            prompt_tokens if config.prompt_tokens is None else config.prompt_tokens,
+            _tokens(text) if config.response_tokens is None else config.response_tokens,
+        )
+
+    @property
+    def text(self):
+        return self._full_text
+
+    def __iter__(self):
+        config = self._backend.config
+        size = max(1, config.chunk_chars)
+        for start in range(0, len(self._full_text), size):
+            if start and config.chunk_delay:
+                time.sleep(config.chunk_delay)
+            yield Chunk(self._full_text[start:start + size])
+
+
+def _tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeBackend:
+    def __init__(self, config=None):
+        self.config = config or FakeConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+
+    def respond(self, prompt, context_chars=0, stream=False):
+        config = self.config
+        with self._lock:
+            config.calls.append(prompt)
+            fail = self._random.random() < config.error_rate
+            kind = self._random.choice(config.error_kinds) if fail else None
+        if config.ttft:
+            time.sleep(config.ttft)
+        if kind:
+            error_type, message = ERRORS[kind]
+            raise error_type(message)
+        if config.answer is not None:
+            text = config.answer(prompt)
+        else:
+            words = " ".join(f"word{i % 17}" for i in range(config.response_words))
+            text = f"Fake answer to: {prompt[:80]}\n\n{words}"
+        return FakeResponse(self, text, _tokens(prompt) + context_chars // 4, stream)
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **kwargs):
+        context = len(self.model.system_instruction or "") + sum(len(p) for m in self.history for p in m["parts"])
+        response = self.model.backend.respond(content, context, stream)
+        self.history.append({"role": "user", "parts": [content]})
+        self.history.append({"role": "model", "parts": [response.text]})
+        return response
+
+
+class FakeGenerativeModel:
+    backend = None  # set by install()
+
+    def __init__(self, model_name=None, system_instruction=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def start_chat(self, history=None, **kwargs):
+        return FakeChat(self, history)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        return self.backend.respond(contents, len(self.system_instruction or ""), stream)
+
+
+def install(config=None):
+    """Put a fake `google.generativeai` in sys.modules. Returns the backend."""
+    backend = FakeBackend(config)
+    module = types.ModuleType("google.generativeai")
+    module.configure = lambda **kwargs: None
+    module.GenerativeModel = type("GenerativeModel", (FakeGenerativeModel,), {"backend": backend})
+    module.FAKE_BACKEND = backend
+
+    try:
+        import google
+    except ImportError:
+        google = types.ModuleType("google")
+        google.__path__ = []
+        sys.modules["google"] = google
+    google.generativeai = module
+    sys.modules["google.generativeai"] = module
+    return backend
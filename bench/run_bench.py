@@ -0,0 +1,274 @@
+"""Offline load test and benchmark for app.py.
+
+Drives the app headlessly with Streamlit's AppTest against the fake Gemini
+backend in bench/fake_genai.py, so no API quota is used. Results go to a JSON
+file that can be compared with an earlier run:
+
+    python -m bench.run_bench
+    python -m bench.run_bench --turns 50 200 --sessions 16 --ttft 0.5
+    python -m bench.run_bench --compare bench/results/20261018-101500.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import fake_genai
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+
+# Idle reruns timed at the end of each conversation
+IDLE_RERUNS = 20
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+    return round(values[index], 3)
+
+
+def deep_size(obj, seen=None):
+    """Bytes held by an object and everything it references (roughly)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+def timed_export(messages, fmt):
+    """What a "Save This Chat" click costs (nothing is built until then).
+
+    Goes through the same callable and the same conversion Streamlit uses
+    when the button is clicked, so an export it can't serve fails here.
+    """
+    from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+    started = time.perf_counter()
+    data = messages.downloader(fmt)()
+    data, _ = convert_data_to_bytes_and_infer_mime(data, unsupported_error=TypeError(f"can't download {type(data)}"))
+    return (time.perf_counter() - started) * 1000, len(data)
+
+
+def new_session(mode=None):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    if mode:
+        at.sidebar.radio[0].set_value(mode).run()
+    return at
+
+
+def timed_run(at, prompt=None):
+    started = time.perf_counter()
+    if prompt is None:
+        at.run()
+    else:
+        at.chat_input[0].set_value(prompt).run()
+    return (time.perf_counter() - started) * 1000
+
+
+# ==========================================
+# SCENARIOS
+# ==========================================
+def conversation(turns, mode=None):
+    """One long session: per-turn and idle rerun time, session memory, transcript cost."""
+    at = new_session(mode)
+    turn_ms = [timed_run(at, f"Question {i}: what paper should I use for flyers number {i}?") for i in range(turns)]
+
+    idle_ms = [timed_run(at) for _ in range(IDLE_RERUNS)]
+    messages = at.session_state["messages"]
+
+    transcript_ms, transcript_bytes = timed_export(messages, "Text")
+    json_export_ms, json_export_bytes = timed_export(messages, "JSON")
+
+    return {
+        "turns": turns,
+        "messages": len(messages),
+        "turn_ms_p50": percentile(turn_ms, 50),
+        "turn_ms_p95": percentile(turn_ms, 95),
+        "first_turns_ms_p50": percentile(turn_ms[:10], 50),
+        "last_turns_ms_p50": percentile(turn_ms[-10:], 50),
+        "idle_rerun_ms_p50": percentile(idle_ms, 50),
+        "idle_rerun_ms_p95": percentile(idle_ms, 95),
+        "messages_bytes": deep_size(messages),
+        "gemini_history_bytes": deep_size(at.session_state["history"]),
+        "transcript_ms": round(transcript_ms, 3),
+        "transcript_bytes": transcript_bytes,
+        "json_export_ms": round(json_export_ms, 3),
+        "json_export_bytes": json_export_bytes,
+        "errors": [e.value for e in at.exception],
+    }
+
+
+@contextlib.contextmanager
+def shared_apptest_globals():
+    """Let several AppTest sessions run side by side in threads.
+
+    AppTest swaps process-wide globals (the Runtime singleton and the
+    "global.appTest" config flag) in and out around every run, so one
+    session finishing pulls them out from under the others. Pin both
+    while the concurrent sessions run. It also compiles app.py afresh on
+    every run, and compiling from several threads at once can trip a
+    CPython bug ("AST constructor recursion depth mismatch"), so share one
+    script cache as the real server does.
+    """
+    from unittest import mock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.media_file_mgr = app_test.MediaFileManager(app_test.MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = app_test.DataframeSourceManager()
+    runtime.cache_storage_manager = app_test.MemoryCacheStorageManager()
+    runtime.bidi_component_registry = app_test.BidiComponentManager()
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(APP)  # compile once, before the threads start
+    with app_test.patch_config_options({"global.appTest": True}), \
+            mock.patch.object(app_test, "ScriptCache", lambda: script_cache), \
+            mock.patch.object(local_script_runner, "ScriptCache", lambda: script_cache), \
+            mock.patch.object(Runtime, "instance", classmethod(lambda cls: runtime)), \
+            mock.patch.object(Runtime, "exists", classmethod(lambda cls: True)):
+        yield
+
+
+def throughput(sessions, turns_per_session, mode=None):
+    """Many sessions chatting at once through the same process."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def run_session(n):
+        at = new_session(mode)
+        for i in range(turns_per_session):
+            ms = timed_run(at, f"Session {n} question {i}: tips for a grand opening flyer?")
+            shown_errors = [e.value for e in at.error]
+            with lock:
+                latencies.append(ms)
+                errors.extend(shown_errors)
+
+    started = time.perf_counter()
+    with shared_apptest_globals(), ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(run_session, range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "seconds": round(elapsed, 3),
+        "turns_per_second": round(len(latencies) / elapsed, 2),
+        "turn_ms_p50": percentile(latencies, 50),
+        "turn_ms_p95": percentile(latencies, 95),
+        "errors_shown": len(errors),
+    }
+
+
+# ==========================================
+# RESULTS
+# ==========================================
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(old, new, path=""):
+    """Print numeric fields that changed between two results files."""
+    if isinstance(new, dict):
+        for key, value in new.items():
+            if key != "args" and isinstance(old, dict) and key in old:
+                compare(old[key], value, f"{path}.{key}" if path else key)
+    elif isinstance(new, list):
+        for i, (a, b) in enumerate(zip(old, new)):
+            compare(a, b, f"{path}[{i}]")
+    elif isinstance(new, (int, float)) and isinstance(old, (int, float)) and not isinstance(new, bool) and old != new:
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "new"
+        print(f"{path:55} {old:>14} -> {new:<14} {change}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[50, 200, 1000], help="conversation lengths to test")
+    parser.add_argument("--mode", help="app mode to test (default: the app's first mode)")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions for the throughput test")
+    parser.add_argument("--session-turns", type=int, default=5, help="turns per session in the throughput test")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake time-to-first-token in seconds (throughput test)")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="fake seconds between chunks (throughput test)")
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--response-words", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake calls that fail")
+    parser.add_argument("--error-kinds", nargs="+", default=["429"], choices=sorted(fake_genai.ERRORS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="results file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    for name in ("RESPONSE_CACHE_PATH", "TELEMETRY_PATH", "TELEMETRY_PROMETHEUS_PATH"):
+        os.environ.pop(name, None)
+    config = fake_genai.FakeConfig(
+        chunk_chars=args.chunk_chars,
+        response_words=args.response_words,
+        error_rate=args.error_rate,
+        error_kinds=tuple(args.error_kinds),
+        seed=args.seed,
+    )
+    backend = fake_genai.install(config)
+
+    results = {
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "args": vars(args),
+        "conversations": [],
+    }
+
+    # Long conversations: no fake latency, we want the app's own overhead
+    for turns in args.turns:
+        print(f"conversation: {turns} turns...", flush=True)
+        results["conversations"].append(conversation(turns, args.mode))
+
+    print(f"throughput: {args.sessions} sessions x {args.session_turns} turns...", flush=True)
+    config.ttft = args.ttft
+    config.chunk_delay = args.chunk_delay
+    results["throughput"] = throughput(args.sessions, args.session_turns, args.mode)
+    results["model_calls"] = len(backend.config.calls)
+
+    out = args.out or os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nwrote {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import itertools
+import random
+import threading
+import time
+from collections import deque
+
+# ==========================================
+# SHARED GEMINI DISPATCHER
+# ==========================================
+# Every model call from every session goes through one Dispatcher (app.py
+# keeps it in st.cache_resource). It caps how many requests are in flight,
+# queues the rest in order, retries quota/timeout errors with jittered
+# backoff, and trips a circuit breaker when the API keeps failing so callers
+# can fall back to something local instead of piling on more requests.
+
+# Status codes / exception names that are worth retrying. We match on names
+# so we don't have to import google.api_core here.
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "GatewayTimeout",
+}
+
+# How often a waiting caller gets its on_wait() callback (seconds)
+WAIT_POLL = 0.5
+
+
+class ServiceDegraded(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+def is_transient(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)  # some clients use an enum here
+    return code in TRANSIENT_CODES or type(error).__name__ in TRANSIENT_NAMES
+
+
+class CircuitBreaker:
+    """Opens after `threshold` failures in a row, lets one trial call through after `cooldown`."""
+
+    def __init__(self, threshold=5, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        # A trial call that ended without a verdict (e.g. cancelled)
+        with self._lock:
+            self._trial_running = False
+
+
+class DispatchedStream:
+    """What Dispatcher.stream() returns: iterate it for chunks.
+
+    `usage_metadata` is passed through from the Gemini response once it's done.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.response = None
+        self.attempts = 0
+        self.waited = 0.0
+
+    @property
+    def usage_metadata(self):
+        return getattr(self.response, "usage_metadata", None)
+
+    def __iter__(self):
+        return self._chunks
+
+    def close(self):
+        self._chunks.close()
+
+
+class Dispatcher:
+    def __init__(self, max_in_flight=4, max_retries=3, base_delay=0.5, max_delay=8.0, breaker=None):
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.in_flight = 0
+        self._queue = deque()  # tickets waiting for a slot, oldest first
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def waiting(self):
+        return len(self._queue)
+
+    # --- Public API ---
+    def stream(self, request, on_wait=None, on_retry=None):
+        """Run a streaming request in a slot: `request()` must return an iterable of chunks.
+
+        on_wait(position) is called from this thread while queued (1 = next in
+        line); on_retry(attempt, delay, error) before each retry. If either
+        raises (e.g. Streamlit stopping the script because the visitor left),
+        the request is dropped from the queue and its slot is freed.
+        Raises ServiceDegraded without calling the API while the breaker is open.
+        """
+        result = DispatchedStream(None)
+        result._chunks = self._run_stream(result, request, on_wait, on_retry)
+        # Start it now so queueing, retries and errors before the first
+        # chunk happen here and not halfway through the caller's loop
+        first = next(result._chunks, None)
+        result._chunks = _prepend(first, result._chunks)
+        return result
+
+    def call(self, request, on_wait=None):
+        """Run a plain (non-streaming) request in a slot, with retries. Returns its result."""
+        if not self.breaker.allow():
+            raise ServiceDegraded("The model API is temporarily unavailable.")
+        try:
+            self._acquire(on_wait)
+            try:
+                return self._with_retries(request, None)[0]
+            finally:
+                self._release()
+        finally:
+            self.breaker.release()
+
+    def status(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+    # --- Internals ---
+    def _run_stream(self, result, request, on_wait, on_retry):
+        if not self.breaker.allow():
+            raise ServiceDegraded("The model API is temporarily unavailable.")
+        started = time.monotonic()
+        try:
+            self._acquire(on_wait)
+        except BaseException:
+            self.breaker.release()
+            raise
+        result.waited = time.monotonic() - started
+        try:
+            def first_chunk():
+                response = request()
+                chunks = iter(response)
+                # Errors usually show up before the first chunk, retry those too
+                return response, chunks, next(chunks, None)
+
+            (response, chunks, first), result.attempts = self._with_retries(first_chunk, on_retry)
+            result.response = response
+            if first is not None:
+                yield first
+            yield from chunks
+        finally:
+            self.breaker.release()
+            self._release()
+
+    def _with_retries(self, fn, on_retry):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                value = fn()
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                if attempt > self.max_retries:
+                    self.breaker.failure()
+                    raise
+                # Full jitter, so a burst of 429s doesn't retry in lockstep
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                if on_retry is not None:
+                    on_retry(attempt, delay, e)
+                time.sleep(delay)
+                continue
+            self.breaker.success()
+            return value, attempt
+
+    def _acquire(self, on_wait):
+        ticket = next(self._tickets)
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while self._queue[0] != ticket or self.in_flight >= self.max_in_flight:
+                    if on_wait is not None:
+                        position = self._queue.index(ticket) + 1
+                        # Don't hold the lock while the caller redraws
+                        self._cond.release()
+                        try:
+                            on_wait(position)
+                        finally:
+                            self._cond.acquire()
+                    self._cond.wait(WAIT_POLL)
+            except BaseException:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+                raise
+            self._queue.popleft()
+            self.in_flight += 1
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+
+def _prepend(first, chunks):
+    try:
+        if first is not None:
+            yield first
+        yield from chunks
+    finally:
+        # Closing us early must close the inner generator too, so its slot is freed now
+        chunks.close()
@@ -0,0 +1,131 @@
+import threading
+
+from knowledge import estimate_tokens
+
+# ==========================================
+# CONVERSATION HISTORY FOR GEMINI
+# ==========================================
+# Keeps the Gemini-format history for one session, built up one message at a
+# time instead of re-made from st.session_state.messages on every turn.
+# When the history goes over its token budget, the oldest turns are folded
+# into a running summary in a background thread, so long chats cost about
+# the same per turn as short ones.
+
+DEFAULT_BUDGET = 3000
+
+# Once over budget, summarize down to this fraction of it, so we're not
+# summarizing again on the very next turn
+TARGET_FRACTION = 0.6
+
+# The summary itself may use at most this fraction of the budget
+MAX_SUMMARY_FRACTION = 0.25
+
+# Never fold away the last few messages, the model needs them verbatim
+KEEP_RECENT = 4
+
+SUMMARY_PROMPT = """Summarize this conversation between a customer and a print shop assistant in a few short bullet points.
+Keep every product, size, quantity, price, deadline and name that was mentioned. Leave out greetings.
+
+{conversation}"""
+
+
+class ConversationHistory:
+    """Token-budgeted Gemini history with a rolling summary of older turns.
+
+    `summarize` takes the text to summarize and returns a summary string. It
+    runs off the script thread, so it must not touch Streamlit.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET, summarize=None):
+        self.budget = budget
+        self.summarize = summarize
+        self.summary = ""
+        self._summary_tokens = 0
+        self._messages = []  # Gemini-format dicts: {"role", "parts": [text]}
+        self._tokens = []  # estimated tokens, one per message
+        self._total = 0
+        self._folding = 0  # how many of the oldest messages are being summarized
+        self._lock = threading.Lock()
+        self._worker = None
+
+    @property
+    def tokens(self):
+        return self._total + self._summary_tokens
+
+    def append(self, role, text):
+        with self._lock:
+            self._messages.append({"role": role, "parts": [text]})
+            tokens = estimate_tokens(text)
+            self._tokens.append(tokens)
+            self._total += tokens
+        if self.tokens > self.budget:
+            self._start_summary()
+
+    def for_model(self):
+        """History to pass to start_chat(): summary (if any) + recent messages."""
+        with self._lock:
+            recent = list(self._messages)
+            summary = self.summary
+        if not summary:
+            return recent
+        return [
+            {"role": "user", "parts": [f"Summary of our conversation so far:\n{summary}"]},
+            {"role": "model", "parts": ["Thanks, I have the earlier details."]},
+            *recent,
+        ]
+
+    # --- Rolling summary ---
+    def _start_summary(self):
+        with self._lock:
+            if self._folding or (self._worker is not None and self._worker.is_alive()):
+                return
+            count = self._fold_count()
+            if count == 0:
+                return
+            self._folding = count
+            conversation = "\n".join(
+                f"{'Customer' if m['role'] == 'user' else 'Assistant'}: {m['parts'][0]}"
+                for m in self._messages[:count]
+            )
+            previous = self.summary
+        if previous:
+            conversation = f"Earlier summary:\n{previous}\n\n{conversation}"
+
+        if self.summarize is None:
+            self._finish_summary(count, previous)
+            return
+        self._worker = threading.Thread(target=self._run_summary, args=(count, conversation, previous), daemon=True)
+        self._worker.start()
+
+    def _fold_count(self):
+        # Oldest messages to fold so we land under TARGET_FRACTION of the budget,
+        # stopping so the kept history starts on a user turn
+        target = self.budget * TARGET_FRACTION
+        total = self.tokens
+        count = 0
+        limit = len(self._messages) - KEEP_RECENT
+        while count < limit and total > target:
+            total -= self._tokens[count]
+            count += 1
+        while 0 < count < len(self._messages) and self._messages[count]["role"] != "user":
+            count += 1
+        return count if count <= len(self._messages) - 2 else 0
+
+    def _run_summary(self, count, conversation, previous):
+        try:
+            summary = self.summarize(SUMMARY_PROMPT.format(conversation=conversation)).strip()
+            # A rambling summary mustn't eat the budget it's meant to protect
+            summary = summary[:int(self.budget * MAX_SUMMARY_FRACTION) * 4]
+        except Exception:
+            # Couldn't summarize, drop the old turns anyway so the budget holds
+            summary = previous
+        self._finish_summary(count, summary)
+
+    def _finish_summary(self, count, summary):
+        with self._lock:
+            del self._messages[:count]
+            self._total -= sum(self._tokens[:count])
+            del self._tokens[:count]
+            self.summary = summary
+            self._summary_tokens = estimate_tokens(summary)
+            self._folding = 0
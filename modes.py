@@ -0,0 +1,90 @@
+import functools
+from dataclasses import dataclass
+
+import knowledge
+
+# ==========================================
+# DEFINE MODES (Text Only - Super Stable)
+# ==========================================
+# Built once per process. app.py, and anything else that needs to talk to
+# the same assistants, reads them from MODES.
+
+MODEL_NAME = "gemini-2.5-flash"
+
+
+@dataclass(frozen=True)
+class ModeConfig:
+    name: str
+    page_title: str
+    initial_msg: str
+    history_budget: int  # tokens of chat history sent to Gemini
+    system_instruction: str = ""  # fixed prompt, for modes that don't use the knowledge base
+    uses_knowledge: bool = False  # Print Expert: prompt comes from knowledge.py and changes daily
+    local_quotes: bool = False  # answer plain price questions from pricing.py
+
+    def chunk_tags(self, prompt, history=()):
+        """Knowledge chunks to send for this turn (None = the whole prompt)."""
+        if not self.uses_knowledge:
+            return None
+        return knowledge.select_tags(prompt, history)
+
+
+@functools.lru_cache(maxsize=128)
+def system_instruction(mode_name, today, chunk_tags=None):
+    """System instruction for a mode on a given day, only built once per (mode, day, chunks)."""
+    config = MODES[mode_name]
+    if config.uses_knowledge:
+        return knowledge.instruction_for(today, chunk_tags)
+    return config.system_instruction
+
+
+MODES = {
+    config.name: config
+    for config in [
+        ModeConfig(
+            name="Print Expert (Chat)",
+            page_title="Any Budget Ai Assistant 💬",
+            initial_msg="Hello! Ask me about file specs, bleeds, prices, or general questions about anything.",
+            history_budget=3000,
+            uses_knowledge=True,
+            local_quotes=True,
+        ),
+        ModeConfig(
+            name="Marketing Copywriter ✍️",
+            page_title="Marketing Copywriter ✍️",
+            initial_msg="What are we writing today? (e.g., 'Headline for a pizza sale')",
+            history_budget=4000,
+            system_instruction="""
+    You are an expert Marketing Copywriter for Any Budget Printing.
+    Your goal is to write CATCHY, PERSUASIVE, and PROFESSIONAL text.
+    - If user asks for a headline, give 3 punchy options.
+    - If user asks for flyer text, organize it with headers and bullet points.
+    - Keep it short enough for physical print.
+    """,
+        ),
+        ModeConfig(
+            name="Print School 🎓",
+            page_title="Print School 🎓",
+            initial_msg="Class is in session! What printing term confuses you?",
+            history_budget=4000,
+            system_instruction="""
+    You are a friendly Printing Tutor.
+    Explain complex printing terms (CMYK, GSM, Vector vs Raster, Bleed) in simple, easy-to-understand language.
+    Use analogies (e.g., "Resolution is like the thread count in sheets").
+    """,
+        ),
+        ModeConfig(
+            name="Idea Generator 💡",
+            page_title="Idea Generator 💡",
+            initial_msg="What kind of business do you have? (e.g., 'Coffee Shop', 'Real Estate')",
+            history_budget=3000,
+            system_instruction="""
+    You are a Business Growth Consultant for Any Budget.
+    When a user tells you their business type, suggest 3-5 specific printed products they need to grow.
+    Explain WHY they need them.
+    """,
+        ),
+    ]
+}
+
+MODE_NAMES = list(MODES)
@@ -0,0 +1,331 @@
+import hashlib
+import re
+
+# ==========================================
+# PRICING DATA
+# ==========================================
+# These strings are pasted straight into the Print Expert prompt AND parsed
+# below into lookup tables, so the model and the local quote engine always
+# read the same numbers. Edit the prices here, nowhere else.
+
+POSTCARD_PRICES = """
+HERE IS THE OFFICIAL POSTCARD PRICING SHEET (2026).
+USE THIS TABLE TO QUOTE PRICES. IF A QUANTITY OR SIZE IS N/A, SAY WE CANNOT PRINT IT.
+
+| Size | Sides | 25 | 50 | 75 | 100 | 250 | 500 | 1000 | 2500 | 5000 | 7500 | 10000 |
+| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |
+| 4" X 6" | 4/0 or 4/4 | $35 | $45 | $55 | $65 | $75 | $85 | $125 | $245 | $295 | $345 | $495 |
+| 2" X 6" | 4/0 | $35 | $45 | $55 | $65 | $75 | $85 | $125 | $145 | $175 | N/A | $200.72 |
+| 3.5" X 5" | 4/0 or 4/4 | N/A | N/A | N/A | N/A | N/A | N/A | $81.02 | $131.95 | $204.05 | N/A | $388.44 |
+| 4.25" X 11" | 4/0 or 4/4 | $55 | $65 | $75 | $95 | $145 | $175 | $195 | $295 | $495 | N/A | $975 |
+| 4.25" X 5.5" | 4/0 or 4/4 | $35 | $45 | $55 | $65 | $75 | $85 | $125 | $245 | $295 | N/A | $495 |
+| 4.25" X 6" | 4/0 or 4/4 | N/A | N/A | N/A | $65 | $75 | $85 | $125 | $245 | $295 | N/A | $495 |
+| 5" X 7" | 4/0 or 4/4 | $55 | $65 | $75 | $85 | $145 | $175 | $195 | $245 | $395 | $595 | $795 |
+| 6" X 11" | 4/0 or 4/4 | $45 | $65 | $85 | $105 | $175 | $195 | $295 | $495 | $695 | $1,095 | $1,395 |
+| 6" X 9" | 4/0 or 4/4 | $45 | $65 | $85 | $105 | $175 | $195 | $295 | $395 | $595 | $895 | $1,095 |
+| 3.667" X 8.5"| 4/0 | $55 | $65 | $75 | $85 | $125 | $145 | $178.75| $287.32| $441.67| N/A | $876.26 |
+| 5.5" X 8.5" | 4/0 or 4/4 | $55 | $65 | $75 | $85 | $145 | $195 | $245 | $345 | $495 | $795 | $995 |
+| 5" X 8" | 4/0 or 4/4 | N/A | N/A | N/A | $85 | $145 | $195 | $245 | $345 | $495 | N/A | $595 |
+| 6" X 8.5" | 4/0 or 4/4 | $55 | $65 | $75 | $85 | $145 | $195 | $295 | $395 | $495 | N/A | $975 |
+| 6" X 8" | 4/0 or 4/4 | N/A | N/A | N/A | $105 | $175 | $195 | $245 | $345 | $513.72 | $810.34 | $1019.44 |
+
+Definition of Sides:
+- 4/0 means Full Color Front, Blank Back.
+- 4/4 means Full Color Front, Full Color Back.
+"""
+
+BUSINESS_CARD_PRICES = "100 = $55.00, 250 = $65.00, 500 = $75.00, 1,000 = $95.00, 2,500 = $125.00, 5,000 = $195.00, 10,000 = $225.00"
+
+SAME_DAY_BUSINESS_CARD_PRICES = "25 = $35.00, 50 = $37.50, 75 = $40.00, 100 = $45.00, 250 = $55.00, 500 = $65.00, 1,000 = $95.00"
+
+RIGID_SIGN_PRICES = "12x12=$25, 12x18=$25, 18x24=$35, 24x24=$38, 20x30=$39, 22x28=$40, 18x36=$41, 23x30=$42, 24x31=$43, 18x48=$45, 24x36=$45, 23x40=$47.92, 28x36=$52.50, 27x40=$56.25, 24x48=$60, 29x44=$66.50, 32x40=$66.75, 36x46=$86.25, 36x48=$90, 48x48=$120, 40x60=$125, 48x96=$240"
+
+BANNER_PRICES = "24x36=$35, 24x48=$35, 24x60=$37.50, 30x48=$37.50, 24x72=$45, 36x48=$45, 30x72=$56.25, 36x60=$56.25, 24x96=$60, 36x72=$67.50, 24x120=$75, 48x60=$75, 36x96=$90, 48x72=$90, 36x120=$112.50, 48x96=$120, 48x120=$150, 60x96=$150, 36x180=$168.75, 48x144=$180, 72x96=$180, 60x120=$187.50, 48x180=$225, 60x144=$225, 96x108=$270, 96x120=$300, 96x144=$360"
+
+# Changes whenever any price list above is edited. Anything derived from the
+# prices (e.g. cached answers) should be keyed on this.
+PRICING_VERSION = hashlib.sha256(
+    "\n".join([POSTCARD_PRICES, BUSINESS_CARD_PRICES, SAME_DAY_BUSINESS_CARD_PRICES, RIGID_SIGN_PRICES, BANNER_PRICES]).encode()
+).hexdigest()[:12]
+
+# Large format rules (same numbers the prompt gives the model)
+SIGN_RATE_PER_SQFT = 7.50
+SIGN_MINIMUM = 25.00
+BANNER_RATE_PER_SQFT = 3.75
+BANNER_MINIMUM = 35.00
+DOUBLE_SIDED_MULTIPLIER = 1.7
+H_STAKE_PRICE = 1.90
+
+# Standard business cards come in these sizes (all the same price)
+BUSINESS_CARD_SIZES = [(2, 3.5), (2.125, 3.375), (2.5, 2.5), (2, 2), (2, 3), (1.5, 3.5), (1.75, 3.5)]
+
+
+# ==========================================
+# TABLE PARSING (runs once at import)
+# ==========================================
+def _money(text):
+    text = text.strip().replace("$", "").replace(",", "")
+    if not text or text.upper() == "N/A":
+        return None
+    return round(float(text), 2)
+
+
+def _size_key(width, height):
+    # Orientation doesn't matter for pricing, 6x4 is a 4x6
+    return tuple(sorted((float(width), float(height))))
+
+
+def _parse_postcards(sheet):
+    quantities = []
+    table = {}
+    for line in sheet.splitlines():
+        cells = [c.strip() for c in line.strip().strip("|").split("|")]
+        if len(cells) < 3:
+            continue
+        if cells[0] == "Size":
+            quantities = [int(q) for q in cells[2:]]
+            continue
+        dims = re.findall(r"\d+(?:\.\d+)?", cells[0])
+        if len(dims) != 2 or not quantities:
+            continue
+        table[_size_key(*dims)] = {
+            "label": cells[0],
+            "sides": set(s.strip() for s in cells[1].split("or")),
+            "prices": dict(zip(quantities, (_money(c) for c in cells[2:]))),
+        }
+    return table
+
+
+def _parse_quantity_list(text):
+    return {int(q.replace(",", "")): _money(p) for q, p in re.findall(r"([\d,]+)\s*=\s*(\$[\d.,]+)", text)}
+
+
+def _parse_size_list(text):
+    return {
+        _size_key(w, h): _money(p)
+        for w, h, p in re.findall(r"(\d+(?:\.\d+)?)x(\d+(?:\.\d+)?)=(\$[\d.,]+)", text)
+    }
+
+
+POSTCARD_TABLE = _parse_postcards(POSTCARD_PRICES)
+BUSINESS_CARD_TABLE = _parse_quantity_list(BUSINESS_CARD_PRICES)
+SAME_DAY_BUSINESS_CARD_TABLE = _parse_quantity_list(SAME_DAY_BUSINESS_CARD_PRICES)
+RIGID_SIGN_TABLE = _parse_size_list(RIGID_SIGN_PRICES)
+BANNER_TABLE = _parse_size_list(BANNER_PRICES)
+
+
+# ==========================================
+# PRICE LOOKUPS
+# ==========================================
+def format_price(amount):
+    # House style: always a dollar sign and always the cents
+    return f"${amount:,.2f}"
+
+
+def rigid_sign_price(width, height, double_sided=False):
+    price = RIGID_SIGN_TABLE.get(_size_key(width, height))
+    if price is None:
+        price = max(width * height / 144 * SIGN_RATE_PER_SQFT, SIGN_MINIMUM)
+    if double_sided:
+        price *= DOUBLE_SIDED_MULTIPLIER
+    return round(price, 2)
+
+
+def banner_price(width, height):
+    price = BANNER_TABLE.get(_size_key(width, height))
+    if price is None:
+        price = max(width * height / 144 * BANNER_RATE_PER_SQFT, BANNER_MINIMUM)
+    return round(price, 2)
+
+
+# ==========================================
+# FAST-PATH QUOTE ROUTER
+# ==========================================
+# Recognizes short, unambiguous price questions ("500 4x6 postcards?",
+# "24x36 coroplast double sided?") and answers them from the tables above.
+# Anything we aren't sure about returns None and goes to Gemini as usual.
+
+MAX_QUOTE_PROMPT_LENGTH = 120
+
+# A size like 24x36, 24" x 36", 3x6 ft or 4' by 8'. Group 2/4 are the units, if given.
+_UNIT = r"(\"|''|inch(?:es)?\b|in\b|'|ft\b\.?|foot\b|feet\b)?"
+_SIZE_RE = re.compile(rf"(\d+(?:\.\d+)?)\s*{_UNIT}\s*(?:x|by)\s*(\d+(?:\.\d+)?)[\s-]*{_UNIT}")
+_FEET = {"'", "ft", "ft.", "foot", "feet"}
+# A unit-less size smaller than anything on the price list is probably feet
+_SMALLEST_SIZE = {
+    product: min(table)
+    for product, table in [("coroplast", RIGID_SIGN_TABLE), ("foam core", RIGID_SIGN_TABLE),
+                           ("rigid sign", RIGID_SIGN_TABLE), ("banner", BANNER_TABLE)]
+}
+# Sizes in metric units go to the model rather than being read as inches
+_METRIC_RE = re.compile(r"\d\s*(?:cm|mm|m|meters?|metres?|centimet\w*|millimet\w*)\b")
+_QUANTITY_RE = re.compile(r"\b(\d{1,3}(?:,\d{3})+|\d+)\b")
+_DOUBLE_RE = re.compile(r"double[\s-]?sided|two[\s-]?sided|2[\s-]?sided|both sides|front and back|4/4")
+_SINGLE_RE = re.compile(r"single[\s-]?sided|one[\s-]?sided|1[\s-]?sided|front only|4/0")
+
+# Questions mentioning these need judgement (or aren't price questions at all)
+_NEEDS_MODEL_RE = re.compile(
+    r"design|write|headline|template|bleed|file|dpi|spec|turnaround|how long|ship|mail|eddm|"
+    r"coat|uv|deliver|laminat|stake|grommet|discount|cheaper|compare|foldover|suede|silk|magnet|"
+    r"sticker|brochure|flyer|poster|sidewalk|\bvs\b|\bor\b|\band\b.*\d|"
+    r"\d\s*(?:cm|mm|m|meters?|metres?)\b"
+)
+
+_PRODUCTS = [
+    ("postcard", re.compile(r"post\s?cards?")),
+    ("business card", re.compile(r"business\s?cards?")),
+    ("coroplast", re.compile(r"coroplast|yard\s?signs?")),
+    ("foam core", re.compile(r"foam\s?core|foamcore|foam\s?board")),
+    ("rigid sign", re.compile(r"rigid\s?signs?")),
+    ("banner", re.compile(r"banners?")),
+]
+
+
+def _dimension(value):
+    return f"{value:g}"
+
+
+def _inches(match, feet_ok=True):
+    """(width, height) in inches from a _SIZE_RE match; a unit given once applies to both."""
+    width, width_unit, height, height_unit = match
+    width_unit = width_unit or height_unit
+    height_unit = height_unit or width_unit
+    width, height = float(width), float(height)
+    if feet_ok:
+        width *= 12 if width_unit in _FEET else 1
+        height *= 12 if height_unit in _FEET else 1
+    return width, height
+
+
+def _below(size, smallest):
+    short, long = _size_key(*size)
+    return short < smallest[0] or long < smallest[1]
+
+
+def _normalize(prompt):
+    text = prompt.lower().replace("×", "x").replace("”", '"').replace("“", '"').replace("″", '"')
+    text = text.replace("’", "'").replace("′", "'")
+    # Paper weights aren't quantities
+    return re.sub(r"\b\d+\s?pt\b", " ", text)
+
+
+def quote(prompt, strict=True):
+    """Answer a recognizable price question locally, or return None for Gemini.
+
+    Replies use the same wording the prompt asks the model for
+    ("$X.00 plus tax"), so customers can't tell which path answered.
+    strict=False skips the "this needs the model" checks; it's for when the
+    model is unavailable and a best-effort table price beats no answer.
+    """
+    text = _normalize(prompt)
+    # Checked even when not strict: a metric size read as inches is a confidently wrong price
+    if _METRIC_RE.search(text):
+        return None
+    if strict and (len(text) > MAX_QUOTE_PROMPT_LENGTH or _NEEDS_MODEL_RE.search(text)):
+        return None
+
+    products = [name for name, pattern in _PRODUCTS if pattern.search(text)]
+    if len(products) != 1:
+        return None
+    product = products[0]
+
+    sizes = _SIZE_RE.findall(text)
+    if len(sizes) > 1:
+        return None
+    size = _inches(sizes[0]) if sizes else None
+    if size and product in ("postcard", "business card") and size != _inches(sizes[0], feet_ok=False):
+        return None  # a postcard in feet is a typo or a joke, let the model handle it
+    if size and product in _SMALLEST_SIZE and not (sizes[0][1] or sizes[0][3]) and _below(size, _SMALLEST_SIZE[product]):
+        # "4x8 coroplast" with no unit is almost surely feet; let the model ask
+        return None
+
+    double = bool(_DOUBLE_RE.search(text))
+    single = bool(_SINGLE_RE.search(text))
+    if double and single:
+        return None
+
+    # Whatever numbers are left once sizes and sides are gone are quantities
+    leftover = _DOUBLE_RE.sub(" ", _SINGLE_RE.sub(" ", _SIZE_RE.sub(" ", text)))
+    quantities = [int(q.replace(",", "")) for q in _QUANTITY_RE.findall(leftover)]
+    if len(quantities) > 1:
+        return None
+    quantity = quantities[0] if quantities else None
+
+    if product == "postcard":
+        return _quote_postcard(size, quantity, double, single)
+    if product == "business card":
+        return _quote_business_card(size, quantity, same_day=bool(re.search(r"same[\s-]?day", text)))
+    if product == "banner":
+        return _quote_banner(size, quantity, double)
+    return _quote_rigid_sign(product, size, quantity, double)
+
+
+def _quote_postcard(size, quantity, double, single):
+    if size is None or quantity is None:
+        return None
+    row = POSTCARD_TABLE.get(_size_key(*size))
+    if row is None or quantity not in row["prices"]:
+        return None
+    sides = "4/4" if double else "4/0" if single else None
+    if sides and sides not in row["sides"]:
+        return None
+
+    label = row["label"]
+    price = row["prices"][quantity]
+    if price is None:
+        return f"Sorry, we cannot print {quantity:,} {label} postcards. Please try a different quantity or size, or call us at (858) 278-3151."
+
+    printed = {"4/4": " printed full color on both sides (4/4)", "4/0": " printed full color on the front only (4/0)"}.get(sides, "")
+    return (
+        f"The price for {quantity:,} {label} postcards{printed} is {format_price(price)} plus tax. "
+        "All Postcards are printed on heavy 14PT C2S Postcard stock."
+    )
+
+
+def _quote_business_card(size, quantity, same_day):
+    if quantity is None:
+        return None
+    if same_day:
+        if size and _size_key(*size) != _size_key(3.5, 2):
+            return None
+        price = SAME_DAY_BUSINESS_CARD_TABLE.get(quantity)
+        if price is None:
+            return None
+        return f'The price for {quantity:,} Full Color Same-Day 3.5" X 2" Business Cards (14pt C2S) is {format_price(price)} plus tax.'
+
+    if size and _size_key(*size) not in {_size_key(*s) for s in BUSINESS_CARD_SIZES}:
+        return None
+    price = BUSINESS_CARD_TABLE.get(quantity)
+    if price is None:
+        return None
+    return (
+        f"The price for {quantity:,} Full Color Standard Business Cards (16pt C2S) is {format_price(price)} plus tax. "
+        "Turnaround time = 4 to 5 business days."
+    )
+
+
+def _quote_rigid_sign(product, size, quantity, double):
+    # Per-sign prices only, multi-sign orders can go to the model
+    if size is None or quantity not in (None, 1):
+        return None
+    name = {"coroplast": "Coroplast Sign", "foam core": "Foam Core Sign", "rigid sign": "Rigid Sign"}[product]
+    if double:
+        name = "Double-Sided " + name
+    price = rigid_sign_price(size[0], size[1], double_sided=double)
+    reply = (
+        f'The price for a {_dimension(size[0])}" x {_dimension(size[1])}" {name} is {format_price(price)} plus tax. '
+        "This includes standard finishing."
+    )
+    if product == "coroplast":
+        reply += f" Would you like to add H-Stakes for {format_price(H_STAKE_PRICE)} each?"
+    return reply
+
+
+def _quote_banner(size, quantity, double):
+    if size is None or double or quantity not in (None, 1):
+        return None
+    price = banner_price(*size)
+    return (
+        f'The price for a {_dimension(size[0])}" x {_dimension(size[1])}" Vinyl Banner is {format_price(price)} plus tax. '
+        "This includes standard finishing."
+    )
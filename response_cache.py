@@ -0,0 +1,134 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pricing
+
+# ==========================================
+# SHARED RESPONSE CACHE
+# ==========================================
+# One instance per process (app.py wraps it in st.cache_resource), so every
+# visitor asking "what are your hours?" after the first one gets the saved
+# answer instead of a new Gemini call.
+
+# Keys cover everything the model saw before the question (greeting, earlier
+# turns, rolling summary). The first question in every session only has the
+# greeting before it, so it matches across sessions; later turns only match
+# an identical conversation, so one visitor's details never reach another.
+
+# Minimum seconds between writes of the disk copy
+SAVE_INTERVAL = 30
+
+
+def _normalize(text):
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+
+def make_key(mode, system_instruction, prompt, history=()):
+    """Cache key for one turn.
+
+    `history` is the Gemini history the prompt is sent with
+    (ConversationHistory.for_model(), summary included).
+    """
+    context = [f"{m['role']}:{_normalize(' '.join(m['parts']))}" for m in history]
+    raw = "\x1f".join([
+        mode,
+        hashlib.sha256(system_instruction.encode()).hexdigest(),
+        pricing.PRICING_VERSION,
+        *context,
+        _normalize(prompt),
+    ])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def replay(text, chunk_size=40):
+    """Yield a cached answer as Gemini-style chunks (objects with `.text`)."""
+    for start in range(0, len(text), chunk_size):
+        yield SimpleNamespace(text=text[start:start + chunk_size])
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a TTL and an optional JSON copy on disk."""
+
+    def __init__(self, max_entries=500, ttl=6 * 60 * 60, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        if path:
+            self._load()
+            atexit.register(self.save)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, text):
+        if not text:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        if self.path and time.time() - self._last_save > SAVE_INTERVAL:
+            self.save()
+
+    # --- Disk persistence ---
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"pricing_version": pricing.PRICING_VERSION, "entries": list(self._entries.items())}
+            self._dirty = False
+            self._last_save = time.time()
+        # Write to a temp file and swap it in, so a crash never leaves half a file
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Answers saved under an older price sheet may quote old prices
+        if data.get("pricing_version") != pricing.PRICING_VERSION:
+            return
+        now = time.time()
+        for key, (expires_at, text) in data.get("entries", []):
+            if expires_at > now:
+                self._entries[key] = (expires_at, text)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,86 @@
+import time
+
+# ==========================================
+# THROTTLED STREAMING RENDERER
+# ==========================================
+# Gemini sends lots of small chunks. Redrawing the whole reply on every one
+# of them re-sends the growing markdown to the browser each time, so we
+# buffer chunks and only redraw every FLUSH_INTERVAL seconds, on paragraph
+# breaks, or when a lot of text has piled up.
+
+FLUSH_INTERVAL = 0.075  # seconds between redraws
+MAX_PENDING_CHARS = 600  # redraw early if this much text is waiting
+CURSOR = "▌"
+
+
+class StreamRenderer:
+    """Collects streamed text and redraws `placeholder` (any st.empty()) on a schedule.
+
+    Create it just before sending the request, so time-to-first-token
+    includes the model's thinking time.
+    """
+
+    def __init__(self, placeholder, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING_CHARS):
+        self.placeholder = placeholder
+        self.interval = interval
+        self.max_pending = max_pending
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self.flushes = 0
+        self._text = ""
+        self._pending = []
+        self._pending_chars = 0
+        self._last_flush = self.started
+
+    @property
+    def text(self):
+        return self._text + "".join(self._pending)
+
+    def write(self, text):
+        if not text:
+            return
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        self.chunks += 1
+        self._pending.append(text)
+        self._pending_chars += len(text)
+
+        elapsed = now - self._last_flush
+        if (
+            self.flushes == 0  # show the first words right away
+            or elapsed >= self.interval
+            or self._pending_chars >= self.max_pending
+            or ("\n\n" in text and elapsed >= self.interval / 3)
+        ):
+            self._flush(now, CURSOR)
+
+    def finish(self):
+        """Final redraw without the cursor. Returns the full reply."""
+        self._flush(time.perf_counter(), "")
+        self.finished_at = time.perf_counter()
+        return self._text
+
+    def _flush(self, now, cursor):
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending = []
+            self._pending_chars = 0
+        self.placeholder.markdown(self._text + cursor)
+        self._last_flush = now
+        self.flushes += 1
+
+    def stats(self):
+        """Timing for this reply, in milliseconds (None if it never got that far)."""
+        def ms(t):
+            return None if t is None else round((t - self.started) * 1000, 1)
+
+        return {
+            "ttft_ms": ms(self.first_token_at),
+            "stream_ms": ms(self.finished_at),
+            "chunks": self.chunks,
+            "flushes": self.flushes,
+            "chars": len(self._text),
+        }
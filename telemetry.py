@@ -0,0 +1,182 @@
+import json
+import logging
+import logging.handlers
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+# ==========================================
+# TURN TELEMETRY
+# ==========================================
+# One record per chat turn (and per script rerun), kept in an in-process ring
+# buffer shared by every session. Optionally also written to a rotating JSONL
+# file and a Prometheus text snapshot for whatever scrapes the box.
+
+BUFFER_SIZE = 2000
+
+# Minimum seconds between rewrites of the Prometheus snapshot
+PROMETHEUS_INTERVAL = 15
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+def usage_from(response):
+    """Token counts from a Gemini response's usage_metadata (zeros if missing)."""
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "response_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+    }
+
+
+class Telemetry:
+    """Thread-safe recorder for turn and rerun metrics."""
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, max_bytes=5_000_000, backups=5):
+        self.turns = deque(maxlen=BUFFER_SIZE)
+        self.reruns = deque(maxlen=BUFFER_SIZE)
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self._last_prometheus = 0.0
+        self._log = None
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(jsonl_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log = logging.getLogger(f"anybudget.telemetry.{id(self)}")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            self._log.addHandler(handler)
+
+    def record_turn(self, mode, source, latency_ms, ttft_ms=None, prompt_tokens=0, response_tokens=0,
+                    chunks=0, error=None, session=None):
+        """Record one chat turn.
+
+        source is where the answer came from: "model", "cache" or "local_quote".
+        error is the exception class name if the turn failed.
+        """
+        record = {
+            "ts": round(time.time(), 3),
+            "kind": "turn",
+            "session": session,
+            "mode": mode,
+            "source": source,
+            "latency_ms": round(latency_ms, 1),
+            "ttft_ms": ttft_ms,
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+            "chunks": chunks,
+            "error": error,
+        }
+        with self._lock:
+            self.turns.append(record)
+        self._export(record)
+        return record
+
+    def record_rerun(self, duration_ms, mode=None):
+        record = {"ts": round(time.time(), 3), "kind": "rerun", "mode": mode, "duration_ms": round(duration_ms, 2)}
+        with self._lock:
+            self.reruns.append(record)
+        self._export(record)
+        return record
+
+    # --- Aggregates ---
+    def summary(self):
+        """Per-mode latency/token stats over the turns still in the buffer."""
+        with self._lock:
+            turns = list(self.turns)
+        by_mode = {}
+        for record in turns:
+            by_mode.setdefault(record["mode"], []).append(record)
+
+        rows = {}
+        for mode, records in by_mode.items():
+            ok = [r for r in records if not r["error"]]
+            model_calls = [r for r in ok if r["source"] == "model"]
+            rows[mode] = {
+                "turns": len(records),
+                "errors": len(records) - len(ok),
+                "cache_hits": sum(r["source"] == "cache" for r in records),
+                "local_quotes": sum(r["source"] == "local_quote" for r in records),
+                "latency_p50_ms": percentile([r["latency_ms"] for r in ok], 50),
+                "latency_p95_ms": percentile([r["latency_ms"] for r in ok], 95),
+                "ttft_p50_ms": percentile([r["ttft_ms"] for r in model_calls], 50),
+                "ttft_p95_ms": percentile([r["ttft_ms"] for r in model_calls], 95),
+                "prompt_tokens_p50": percentile([r["prompt_tokens"] for r in model_calls], 50),
+                "prompt_tokens_p95": percentile([r["prompt_tokens"] for r in model_calls], 95),
+                "response_tokens_p50": percentile([r["response_tokens"] for r in model_calls], 50),
+                "response_tokens_p95": percentile([r["response_tokens"] for r in model_calls], 95),
+            }
+        return rows
+
+    def rerun_summary(self):
+        with self._lock:
+            durations = [r["duration_ms"] for r in self.reruns]
+        return {
+            "reruns": len(durations),
+            "p50_ms": percentile(durations, 50),
+            "p95_ms": percentile(durations, 95),
+        }
+
+    def prometheus(self):
+        """Current buffer as Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        summary = self.summary()
+        metric("anybudget_turns", "gauge", "Chat turns in the telemetry buffer.",
+               [({"mode": m}, s["turns"]) for m, s in summary.items()])
+        metric("anybudget_turn_errors", "gauge", "Failed chat turns in the telemetry buffer.",
+               [({"mode": m}, s["errors"]) for m, s in summary.items()])
+        metric("anybudget_cache_hits", "gauge", "Turns answered from the response cache.",
+               [({"mode": m}, s["cache_hits"]) for m, s in summary.items()])
+        metric("anybudget_local_quotes", "gauge", "Turns answered by the local price lookup.",
+               [({"mode": m}, s["local_quotes"]) for m, s in summary.items()])
+        metric("anybudget_turn_latency_ms", "gauge", "Turn latency percentiles in milliseconds.",
+               [({"mode": m, "quantile": q}, s[f"latency_p{q}_ms"]) for m, s in summary.items() for q in (50, 95)])
+        metric("anybudget_ttft_ms", "gauge", "Model time-to-first-token percentiles in milliseconds.",
+               [({"mode": m, "quantile": q}, s[f"ttft_p{q}_ms"]) for m, s in summary.items() for q in (50, 95)])
+        metric("anybudget_prompt_tokens", "gauge", "Prompt token percentiles per model call.",
+               [({"mode": m, "quantile": q}, s[f"prompt_tokens_p{q}"]) for m, s in summary.items() for q in (50, 95)])
+        metric("anybudget_response_tokens", "gauge", "Response token percentiles per model call.",
+               [({"mode": m, "quantile": q}, s[f"response_tokens_p{q}"]) for m, s in summary.items() for q in (50, 95)])
+        reruns = self.rerun_summary()
+        metric("anybudget_rerun_ms", "gauge", "Script rerun time percentiles in milliseconds.",
+               [({"quantile": q}, reruns[f"p{q}_ms"]) for q in (50, 95)])
+        return "\n".join(lines) + "\n"
+
+    # --- Export ---
+    def _export(self, record):
+        if self._log is not None:
+            self._log.info(json.dumps(record, ensure_ascii=False))
+        if self.prometheus_path and time.time() - self._last_prometheus > PROMETHEUS_INTERVAL:
+            self._last_prometheus = time.time()
+            self.write_prometheus()
+
+    def write_prometheus(self):
+        if not self.prometheus_path:
+            return
+        folder = os.path.dirname(os.path.abspath(self.prometheus_path))
+        os.makedirs(folder, exist_ok=True)
+        # node_exporter's textfile collector wants the file swapped in atomically
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, self.prometheus_path)
@@ -0,0 +1,117 @@
+import datetime
+import io
+import json
+import time
+
+# ==========================================
+# CHAT TRANSCRIPT
+# ==========================================
+# The conversation as the visitor sees it, one compact record per message.
+# Appending is all that happens on a normal rerun; the downloadable files
+# (text, Markdown, JSON) are only written when someone clicks "Save", a
+# message at a time into a BytesIO (which is what st.download_button takes),
+# never as one big string built up with +=.
+
+# Format -> (file extension, MIME type)
+FORMATS = {
+    "Text": ("txt", "text/plain"),
+    "Markdown": ("md", "text/markdown"),
+    "JSON": ("json", "application/json"),
+}
+
+ROLE_LABELS = {"user": "You", "model": "AI Assistant"}
+
+
+class Message:
+    """One chat message. Slotted, since a busy server holds a lot of these."""
+
+    __slots__ = ("role", "text", "ts")
+
+    def __init__(self, role, text, ts=None):
+        self.role = role  # "user" or "model", same as Gemini
+        self.text = text
+        self.ts = time.time() if ts is None else ts
+
+    def __repr__(self):
+        return f"Message({self.role!r}, {self.text[:30]!r})"
+
+
+def _time(ts, timespec="seconds"):
+    return datetime.datetime.fromtimestamp(ts).isoformat(sep=" ", timespec=timespec)
+
+
+class Transcript:
+    """The messages of one chat, in order, plus on-demand exports of them.
+
+    Reads like a list of Message (len, indexing, slicing, iterating).
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.started = time.time()
+        self.messages = []
+
+    def append(self, role, text):
+        message = Message(role, text)
+        self.messages.append(message)
+        return message
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    # --- Export ---
+    def export(self, fmt="Text", count=None):
+        """Write the first `count` messages (default all) in `fmt` to a file object.
+
+        Returns an io.BytesIO rewound to the start.
+        """
+        messages = self.messages[:count]
+        writer = {"Text": self._text, "Markdown": self._markdown, "JSON": self._json}[fmt]
+        out = io.BytesIO()
+        for piece in writer(messages):
+            out.write(piece.encode("utf-8"))
+        out.seek(0)
+        return out
+
+    def downloader(self, fmt):
+        """Zero-argument callable for st.download_button(data=...).
+
+        Streamlit only calls it when the button is clicked (on another
+        thread), and it exports the chat as it was when the button was drawn.
+        """
+        count = len(self.messages)
+        return lambda: self.export(fmt, count)
+
+    def file_name(self, fmt):
+        extension = FORMATS[fmt][0]
+        return f"AnyBudget_Chat_History.{extension}"
+
+    def _text(self, messages):
+        # Same layout the old "Save This Chat" button produced
+        for message in messages:
+            role = "YOU" if message.role == "user" else "AI ASSISTANT"
+            yield f"{role}: {message.text}\n\n"
+
+    def _markdown(self, messages):
+        yield f"# Any Budget Ai: {self.mode}\n\n"
+        yield f"_Started {_time(self.started, 'minutes')}, exported {_time(time.time(), 'minutes')}_\n\n"
+        for message in messages:
+            yield f"### {ROLE_LABELS.get(message.role, message.role)} ({_time(message.ts)})\n\n{message.text}\n\n"
+
+    def _json(self, messages):
+        # Written a message at a time rather than json.dumps() of the whole chat
+        yield "{\n"
+        yield f'  "mode": {json.dumps(self.mode)},\n'
+        yield f'  "started": "{_time(self.started)}",\n'
+        yield f'  "exported": "{_time(time.time())}",\n'
+        yield '  "messages": ['
+        for i, message in enumerate(messages):
+            record = {"role": message.role, "time": _time(message.ts), "text": message.text}
+            yield ("," if i else "") + "\n    " + json.dumps(record, ensure_ascii=False)
+        yield "\n  ]\n}\n"